@@ -0,0 +1,148 @@
+import functools
+import json
+import logging
+import os
+import time
+
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+
+from . import concurrency, endpoints, http_client, metrics, retry
+
+# Use this logger to forward log messages to CloudWatch Logs.
+LOG = logging.getLogger(__name__)
+
+# Independent ARM requests are sent as one POST to the ARM batch endpoint,
+# that runs them and returns every response at once: one round trip, and
+# one request drawn from the subscription quota, instead of one per request.
+ARM_BATCH_ENABLED = os.environ.get("AZURE_ARM_BATCH", "true").lower() == "true"
+ARM_BATCH_MAX_REQUESTS = int(os.environ.get("AZURE_ARM_BATCH_MAX_REQUESTS", "20"))
+ARM_BATCH_API_VERSION = "2020-06-01"
+
+# Large batches complete asynchronously: ARM answers 202 with a Location to poll.
+ARM_BATCH_MAX_POLLS = 10
+ARM_BATCH_MAX_POLL_DELAY_SECONDS = 2.0
+
+# Responses of the batch endpoint meaning it is not available, e.g. in a
+# cloud or an emulator without it; requests are then sent one by one for
+# the lifetime of the container.
+UNSUPPORTED_STATUS_CODES = (404, 405, 501)
+
+# Batched requests answered with these are sent again on their own, through
+# the retry engine.
+RESENT_STATUS_CODES = retry.THROTTLED_STATUS_CODES + retry.TRANSIENT_STATUS_CODES
+
+_batch_unsupported = False
+
+
+class ArmRequest(NamedTuple):
+    method: str
+    url: str
+    json: Optional[Any] = None
+
+
+class BatchItemResponse:
+    """Response of one request of a batch, read like a requests.Response."""
+
+    def __init__(self, status_code: int, headers: Optional[Mapping[str, str]], content: Any) -> None:
+        self.status_code = status_code
+        self.headers = _Headers(headers or {})
+        self._json = content
+        self.content = b"" if content is None else json.dumps(content).encode()
+
+    def json(self) -> Any:
+        if self._json is None:
+            raise ValueError("The response has no content")
+        return self._json
+
+
+class _Headers(Dict[str, str]):
+    """Case insensitive headers, like the ones of a requests.Response."""
+
+    def __init__(self, headers: Mapping[str, str]) -> None:
+        super().__init__((name.lower(), value) for name, value in headers.items())
+
+    def get(self, name: str, default: Any = None) -> Any:  # type: ignore[override]
+        return super().get(name.lower(), default)
+
+    def __getitem__(self, name: str) -> str:
+        return super().__getitem__(name.lower())
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and super().__contains__(name.lower())
+
+
+def send(requests: Sequence[ArmRequest], headers: Mapping[str, str]) -> List[Any]:
+    """Send independent ARM requests, and return their responses in order.
+
+    Two or more requests go out as ARM batches of up to
+    AZURE_ARM_BATCH_MAX_REQUESTS; a single request, or every request when
+    the batch endpoint fails, is sent on its own.  The requests of a batch
+    run in any order, so none may depend on another, and a failed batch may
+    have run some of them, so all must be safe to send twice.
+    """
+    if len(requests) <= 1 or not ARM_BATCH_ENABLED or _batch_unsupported:
+        return _send_individually(requests, headers)
+
+    responses: List[Any] = []
+    for start in range(0, len(requests), ARM_BATCH_MAX_REQUESTS):
+        responses.extend(_send_batch(requests[start:start + ARM_BATCH_MAX_REQUESTS], headers))
+
+    return responses
+
+
+def _send_batch(requests: Sequence[ArmRequest], headers: Mapping[str, str]) -> List[Any]:
+    global _batch_unsupported
+
+    payload = {"requests": [
+        {"httpMethod": request.method, "url": request.url, "name": str(index), **({"content": request.json} if request.json is not None else {})}
+        for index, request in enumerate(requests)
+    ]}
+    url = f"{endpoints.management_url()}/batch?api-version={ARM_BATCH_API_VERSION}"
+
+    response = http_client.request('POST', url, headers=headers, json=payload)
+    polls = 0
+    while response.status_code == 202 and response.headers.get('Location') and polls < ARM_BATCH_MAX_POLLS:
+        time.sleep(min(float(response.headers.get('Retry-After') or 1), ARM_BATCH_MAX_POLL_DELAY_SECONDS))
+        response = http_client.request('GET', response.headers['Location'], headers=headers)
+        polls += 1
+
+    if response.status_code in UNSUPPORTED_STATUS_CODES:
+        LOG.info(f"ARM batch endpoint not available ({response.status_code}), sending requests one by one")
+        _batch_unsupported = True
+    if response.status_code != 200:
+        LOG.warning(f"ARM batch failed, sending its {len(requests)} requests one by one: {response.status_code} - {response.content}")
+        metrics.record_arm_batch(len(requests), len(requests))
+        return _send_individually(requests, headers)
+
+    # Responses come back in any order, matched to their request by name
+    items = {item.get("name"): item for item in response.json().get("responses", [])}
+    responses: List[Any] = [None] * len(requests)
+    resend = []
+    for index in range(len(requests)):
+        item = items.get(str(index))
+        if item is None or item.get("httpStatusCode") in RESENT_STATUS_CODES:
+            resend.append(index)
+        else:
+            responses[index] = BatchItemResponse(item["httpStatusCode"], item.get("headers"), item.get("content"))
+
+    if resend:
+        LOG.info(f"Sending {len(resend)} of {len(requests)} batched ARM requests again on their own")
+        for index, resent in zip(resend, _send_individually([requests[index] for index in resend], headers)):
+            responses[index] = resent
+
+    metrics.record_arm_batch(len(requests), len(resend))
+    return responses
+
+
+def _send_individually(requests: Sequence[ArmRequest], headers: Mapping[str, str]) -> List[Any]:
+    return concurrency.gather(
+        *[functools.partial(http_client.request, request.method, request.url, headers=dict(headers), json=request.json) for request in requests],
+    )
@@ -0,0 +1,161 @@
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+)
+
+# Use this logger to forward log messages to CloudWatch Logs.
+LOG = logging.getLogger(__name__)
+
+# Threads started per batch of independent Azure calls.  Keep this at or
+# below AZURE_HTTP_POOL_SIZE, so no pooled connection is thrown away.
+MAX_WORKERS = int(os.environ.get("AZURE_CONCURRENCY", "8"))
+
+T = TypeVar("T")
+
+# Requests in flight in the current handler invocation, by key.  Unset
+# outside of an invocation, in which case nothing is deduplicated.
+_in_flight: contextvars.ContextVar[Optional[Dict[Hashable, Future]]] = contextvars.ContextVar("in_flight", default=None)
+_in_flight_lock = threading.Lock()
+
+
+def invocation_scope(handler: Callable[..., T]) -> Callable[..., T]:
+    """Decorator giving a handler its own table of in-flight requests.
+
+    A handler called from another one (e.g. READ from DELETE) shares the
+    table of its caller.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        if _in_flight.get() is not None:
+            return handler(*args, **kwargs)
+
+        token = _in_flight.set({})
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            _in_flight.reset(token)
+
+    return wrapper
+
+
+def single_flight(key: Hashable, call: Callable[[], T]) -> T:
+    """Run call, unless an identical call is already in flight in this
+    invocation, in which case wait for it and share its result.
+
+    Results are not kept once the call completes: a later call with the
+    same key goes to Azure again, so polls always see fresh state.
+    """
+    calls = _in_flight.get()
+    if calls is None:
+        return call()
+
+    with _in_flight_lock:
+        future = calls.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            calls[key] = future
+
+    if not owner:
+        LOG.debug(f"Sharing in-flight request {key}")
+        return future.result()
+
+    try:
+        result = call()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _in_flight_lock:
+            calls.pop(key, None)
+
+
+def gather(*calls: Callable[[], Any], max_workers: int = MAX_WORKERS) -> List[Any]:
+    """Run independent calls in parallel, and return their results in order.
+
+    Every call runs in a copy of the caller's context, so its metrics and
+    in-flight requests are attributed to the calling handler.  Once all the
+    calls completed, the first exception raised, if any, is re-raised.
+    """
+    if len(calls) <= 1:
+        return [call() for call in calls]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(calls)))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, call) for call in calls]
+
+    return [future.result() for future in futures]
+
+
+def gather_until(
+    calls: Sequence[Callable[[], Any]],
+    deadline: float,
+    on_done: Callable[[int, Any], None],
+    max_workers: int = MAX_WORKERS,
+) -> int:
+    """Run calls in parallel, started in order, until time.monotonic()
+    passes deadline, and return how many were started.  The first call
+    always starts, so a caller resuming on a later callback makes progress.
+
+    on_done(index, result) is called in the calling thread as each call
+    completes, so the caller can record progress as it goes.  Calls already
+    started always complete; no new one starts after an exception, that is
+    re-raised once the started calls completed.
+    """
+    in_flight: Dict[Future, int] = {}
+    error: Optional[BaseException] = None
+    started = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while True:
+            while error is None and started < len(calls) and len(in_flight) < max_workers and (started == 0 or time.monotonic() < deadline):
+                in_flight[executor.submit(contextvars.copy_context().run, calls[started])] = started
+                started += 1
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                on_done(index, result)
+
+    if error is not None:
+        raise error
+
+    return started
+
+
+def prefetch(call: Callable[[], Any]) -> Callable[[], None]:
+    """Wrap a call whose result is only wanted for its side effects, e.g.
+    warming a cache, so that a failure is logged rather than raised."""
+
+    def run() -> None:
+        try:
+            call()
+        except Exception as e:
+            LOG.info(f"Prefetch failed, it will be retried when needed: {e}")
+
+    return run
@@ -0,0 +1,248 @@
+import base64
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from cloudformation_cli_python_lib import exceptions  # type: ignore
+
+from . import endpoints
+
+if TYPE_CHECKING:
+    from .models import ResourceModel
+
+# Use this logger to forward log messages to CloudWatch Logs.
+LOG = logging.getLogger(__name__)
+
+# Credentials read from AWS Secrets Manager are kept this long per warm
+# container, then read again, so a rotated secret is picked up without a
+# read on every invocation.  A credential Azure AD rejects is read again
+# straight away.
+CREDENTIAL_TTL_SECONDS = float(os.environ.get("AZURE_CREDENTIAL_TTL_SECONDS", "900"))
+
+# Lifetime of the signed client assertions, and how long before their
+# expiry they stop being handed out.
+ASSERTION_LIFETIME_SECONDS = 600
+ASSERTION_REFRESH_MARGIN_SECONDS = 60
+
+CLIENT_ASSERTION_TYPE = "urn:ietf:params:oauth:client-assertion-type:jwt-bearer"
+
+T = TypeVar("T")
+
+
+class ClientSecret(NamedTuple):
+    secret: str
+
+
+class ClientCertificate(NamedTuple):
+    private_key: str
+    certificate: str
+
+
+Credential = Union[ClientSecret, ClientCertificate]
+
+# A provider returns the credential of the model, or None when the model
+# does not configure it; the first provider returning one wins.
+CredentialProvider = Callable[["ResourceModel"], Optional[Credential]]
+
+# The AWS session of the current handler invocation, to read from Secrets Manager.
+_session: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar("session", default=None)
+
+_CACHE: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def session_scope(handler: Callable[..., T]) -> Callable[..., T]:
+    """Decorator making the AWS session passed to a handler available to the
+    credential providers it ends up calling."""
+
+    @functools.wraps(handler)
+    def wrapper(session: Any, *args: Any, **kwargs: Any) -> T:
+        token = _session.set(session)
+        try:
+            return handler(session, *args, **kwargs)
+        finally:
+            _session.reset(token)
+
+    return wrapper
+
+
+def required(handler: Callable[..., T]) -> Callable[..., T]:
+    """Decorator failing a handler with InvalidRequest when its model
+    configures no usable credential, before anything else runs: tokens
+    cached by other callers are never a substitute for it."""
+
+    @functools.wraps(handler)
+    def wrapper(session: Any, request: Any, *args: Any, **kwargs: Any) -> T:
+        if request.desiredResourceState is not None:
+            resolve(request.desiredResourceState)
+        return handler(session, request, *args, **kwargs)
+
+    return wrapper
+
+
+def token_request_fields(model: "ResourceModel") -> Dict[str, str]:
+    """Return the fields proving the client's identity in a client
+    credentials grant: its secret, or an assertion signed with its certificate."""
+    credential = resolve(model)
+
+    if isinstance(credential, ClientCertificate):
+        return {
+            "client_assertion_type": CLIENT_ASSERTION_TYPE,
+            "client_assertion": client_assertion(model, credential),
+        }
+
+    return {"client_secret": credential.secret}
+
+
+def resolve(model: "ResourceModel") -> Credential:
+    """Return the credential of the first provider configured by the model."""
+    for provider in CREDENTIAL_PROVIDERS:
+        credential = provider(model)
+        if credential is not None:
+            return credential
+
+    raise exceptions.InvalidRequest("No Azure credential: set AzureClientCertificateSecretId, AzureClientSecretId or AzureClientSecret")
+
+
+def fingerprint(model: "ResourceModel") -> str:
+    """Return a digest of the credential the model resolves to, that the
+    tokens obtained with it are cached under: a caller only reuses a token
+    when it presents the same credential.  Raises InvalidRequest when the
+    model configures none."""
+    credential = resolve(model)
+    return hashlib.sha256(json.dumps([type(credential).__name__, *credential]).encode()).hexdigest()
+
+
+def invalidate(model: "ResourceModel") -> None:
+    """Drop the credentials and assertions cached for the model, e.g. after
+    Azure AD rejected them because the secret was rotated."""
+    secret_ids = {model.AzureClientCertificateSecretId, model.AzureClientSecretId}
+    with _CACHE_LOCK:
+        for key in [k for k in _CACHE if k[1] in secret_ids or k[1:3] == (model.AzureTenantId, model.AzureClientId)]:
+            del _CACHE[key]
+
+
+def certificate_provider(model: "ResourceModel") -> Optional[Credential]:
+    """A certificate and its private key, in PEM, read from a Secrets Manager
+    secret: a JSON object with privateKey and certificate, or both PEM blocks."""
+    if not model.AzureClientCertificateSecretId:
+        return None
+
+    def load() -> Credential:
+        value = _secret_value(model.AzureClientCertificateSecretId)
+        try:
+            fields = json.loads(value)
+            return ClientCertificate(private_key=fields["privateKey"], certificate=fields["certificate"])
+        except ValueError:
+            return ClientCertificate(private_key=value, certificate=value)
+
+    return _cached(("certificate", model.AzureClientCertificateSecretId), load, CREDENTIAL_TTL_SECONDS)
+
+
+def secret_store_provider(model: "ResourceModel") -> Optional[Credential]:
+    """A client secret read from a Secrets Manager secret: the secret string
+    itself, or a JSON object with clientSecret."""
+    if not model.AzureClientSecretId:
+        return None
+
+    def load() -> Credential:
+        value = _secret_value(model.AzureClientSecretId)
+        try:
+            return ClientSecret(json.loads(value)["clientSecret"])
+        except (ValueError, KeyError, TypeError):
+            return ClientSecret(value)
+
+    return _cached(("secret", model.AzureClientSecretId), load, CREDENTIAL_TTL_SECONDS)
+
+
+def client_secret_provider(model: "ResourceModel") -> Optional[Credential]:
+    """The AzureClientSecret property, in plain text."""
+    return ClientSecret(model.AzureClientSecret) if model.AzureClientSecret else None
+
+
+# Providers tried in order.  Insert into the list to plug in another one.
+CREDENTIAL_PROVIDERS: List[CredentialProvider] = [
+    certificate_provider,
+    secret_store_provider,
+    client_secret_provider,
+]
+
+
+def client_assertion(model: "ResourceModel", credential: ClientCertificate) -> str:
+    """Return a JWT identifying the client to Azure AD, signed with its
+    certificate's private key (RS256), reused until shortly before it expires."""
+    audience = f"{endpoints.authority_host_url()}/{model.AzureTenantId}/oauth2/token"
+
+    def sign() -> str:
+        # cryptography is only imported when a certificate is used, to keep
+        # it out of the Lambda cold start import time
+        from cryptography import x509  # type: ignore
+        from cryptography.hazmat.primitives import hashes, serialization  # type: ignore
+        from cryptography.hazmat.primitives.asymmetric import padding  # type: ignore
+
+        certificate = x509.load_pem_x509_certificate(credential.certificate.encode())
+        private_key = serialization.load_pem_private_key(credential.private_key.encode(), password=None)
+
+        now = int(time.time())
+        header = {"alg": "RS256", "typ": "JWT", "x5t": _base64url(certificate.fingerprint(hashes.SHA1()))}
+        claims = {
+            "aud": audience,
+            "iss": model.AzureClientId,
+            "sub": model.AzureClientId,
+            "jti": str(uuid.uuid4()),
+            "nbf": now,
+            "iat": now,
+            "exp": now + ASSERTION_LIFETIME_SECONDS,
+        }
+        signing_input = f"{_base64url(json.dumps(header).encode())}.{_base64url(json.dumps(claims).encode())}"
+        signature = private_key.sign(signing_input.encode(), padding.PKCS1v15(), hashes.SHA256())
+
+        return f"{signing_input}.{_base64url(signature)}"
+
+    key = ("assertion", model.AzureTenantId, model.AzureClientId, audience, credential.certificate)
+    return _cached(key, sign, ASSERTION_LIFETIME_SECONDS - ASSERTION_REFRESH_MARGIN_SECONDS)
+
+
+def _secret_value(secret_id: str) -> str:
+    session = _session.get()
+    if session is None:
+        raise exceptions.InvalidRequest(f"Reading {secret_id} needs AWS credentials, and none were passed to the handler")
+
+    return session.client("secretsmanager").get_secret_value(SecretId=secret_id)["SecretString"]
+
+
+def _cached(key: Tuple[str, ...], load: Callable[[], T], ttl: float) -> T:
+    with _CACHE_LOCK:
+        entry = _CACHE.get(key)
+    if entry is not None and entry["expires_at"] > time.monotonic():
+        return entry["value"]
+
+    value = load()
+    with _CACHE_LOCK:
+        _CACHE[key] = {"value": value, "expires_at": time.monotonic() + ttl}
+    LOG.debug(f"Cached {key[0]} credential")
+
+    return value
+
+
+def _base64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
@@ -0,0 +1,39 @@
+import os
+
+# Public Azure cloud endpoints used by the handlers.
+DEFAULT_AUTHORITY_HOST_URL = "https://login.microsoftonline.com"
+DEFAULT_MANAGEMENT_URL = "https://management.azure.com"
+DEFAULT_BLOB_ENDPOINT = "https://{accountName}.blob.core.windows.net"
+
+# Setting AZURE_EMULATOR_URL points every endpoint at a local stand-in for
+# Azure (see tools/azure_emulator.py), e.g. for offline benchmarking.  Each
+# endpoint can also be overridden on its own.  The variables are read on
+# every call, so they can be changed without reloading the handlers.
+EMULATOR_URL_VARIABLE = "AZURE_EMULATOR_URL"
+
+
+def authority_host_url() -> str:
+    """Base URL of the Azure AD token endpoint."""
+    return _endpoint("AZURE_AUTHORITY_HOST_URL", DEFAULT_AUTHORITY_HOST_URL, "")
+
+
+def management_url() -> str:
+    """Base URL of Azure Resource Manager."""
+    return _endpoint("AZURE_MANAGEMENT_URL", DEFAULT_MANAGEMENT_URL, "")
+
+
+def blob_endpoint(account_name: str) -> str:
+    """Base URL of the blob service of the given storage account."""
+    template = _endpoint("AZURE_BLOB_ENDPOINT", DEFAULT_BLOB_ENDPOINT, "/blob/{accountName}")
+    return template.format(accountName=account_name)
+
+
+def _endpoint(variable: str, default: str, emulator_path: str) -> str:
+    if os.environ.get(variable):
+        return os.environ[variable].rstrip("/")
+
+    emulator_url = os.environ.get(EMULATOR_URL_VARIABLE)
+    if emulator_url:
+        return emulator_url.rstrip("/") + emulator_path
+
+    return default
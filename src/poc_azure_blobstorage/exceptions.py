@@ -1,4 +1,10 @@
 # define Python user-defined exceptions
 class ResourceNotFoundException(Exception):
     "When the requested Azure resource is not found"
-    pass
\ No newline at end of file
+    pass
+
+class AzureThrottlingException(Exception):
+    "When Azure keeps throttling requests"
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
\ No newline at end of file
@@ -1,12 +1,17 @@
-import requests  #type: ignore
-import adal  #type: ignore
 import random
 import logging
-import traceback
+import os
 import time
+import traceback
+import base64
 import datetime
+import functools
+import hashlib
+import json
 
-from .exceptions import ResourceNotFoundException
+from . import arm_batch, concurrency, credentials, endpoints, http_client, metrics, polling, probe, read_cache, resource_group_cache, sas, seeding, state_machine
+from .exceptions import AzureThrottlingException, ResourceNotFoundException
+from .token_cache import get_cached_token
 
 from typing import (
     Any,
@@ -29,7 +34,7 @@ from cloudformation_cli_python_lib import (  # type: ignore
     identifier_utils,
 )
 
-from .models import ResourceHandlerRequest, ResourceModel
+from .models import Container, ResourceHandlerRequest, ResourceModel
 
 # Use this logger to forward log messages to CloudWatch Logs.
 LOG = logging.getLogger(__name__)
@@ -37,8 +42,7 @@ LOG = logging.getLogger(__name__)
 # Set logging level
 # (https://docs.python.org/3/library/logging.html#levels);
 # consider using logging.DEBUG for development and testing only.
-LOG.setLevel(logging.DEBUG)
-# LOG.setLevel(logging.DEBUG)
+LOG.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
 
 TYPE_NAME = "POC::Azure::BlobStorage"
 
@@ -56,7 +60,113 @@ CALLBACK_STATUS_IN_PROGRESS = {
     "status": OperationStatus.IN_PROGRESS,
 }
 
+# Defaults of the AzureResourceGroup, AzureLocation, AzureStorageSku and
+# AzureStorageKind properties, used when the template leaves them out.
+
+# Azure Resource Group Details
+RESOURCE_GROUP_NAME = "Multicloud-Storage-rg"
+LOCATION = "australiasoutheast"
+
+# Times a CREATE recreates its resource group, when it is deleted underneath
+RESOURCE_GROUP_MAX_ATTEMPTS = 3
+
+# Resource groups created by CREATE are tagged.  With
+# AZURE_DELETE_EMPTY_RESOURCE_GROUPS=true, DELETE removes them once their
+# last resource is gone; resource groups that existed before, and so are
+# not tagged, are never deleted.  Off by default: nothing stops a CREATE
+# sharing the group from putting an account in it between the emptiness
+# check and the group deletion, that then deletes the new account too.
+RESOURCE_GROUP_OWNER_TAG = 'cfn-created-by'
+DELETE_EMPTY_RESOURCE_GROUPS = os.environ.get("AZURE_DELETE_EMPTY_RESOURCE_GROUPS", "false").lower() == "true"
+
+# Delete the containers, in parallel, before the storage account
+DELETE_CONTAINERS_FIRST = os.environ.get("AZURE_DELETE_CONTAINERS_FIRST", "false").lower() == "true"
+
+# Azure Storage Account Details
+SKU = 'Standard_LRS'
+KIND = 'StorageV2'
+
+# Provisioning states of a storage account that will never reach Succeeded
+FAILED_PROVISIONING_STATES = ('Failed', 'Canceled')
+
+# Kinds of accounts that only take Premium SKUs, and have no access tier
+PREMIUM_ONLY_KINDS = ('BlockBlobStorage',)
+
+# Storage account names are the prefix and a hash of the stack ID, the
+# logical ID and an attempt number: 24 lowercase characters, the longest
+# name Azure accepts.  The attempt number moves on when a name is taken.
+ACCOUNT_NAME_PREFIX = 's3replicated'
+ACCOUNT_NAME_HASH_LENGTH = 12
+ACCOUNT_NAME_MAX_ATTEMPTS = 5
+
+# Accounts are tagged with the client request token of the CREATE that made
+# them, so a retried CREATE recognizes the account it already started.
+REQUEST_TOKEN_TAG = 'cfn-client-request-token'
+
+# Azure Blob Container Details
+# CONTAINER_NAME is created when the template does not list any Containers.
+CONTAINER_NAME = 'blob-container-01'
+
+# Containers are created in parallel, over the pooled connections to the blob endpoint.
+# Keep this at or below AZURE_HTTP_POOL_SIZE, so no connection is thrown away.
+CONTAINER_CONCURRENCY = int(os.environ.get("AZURE_CONTAINER_CONCURRENCY", "8"))
+
+# Storage accounts are tagged with the name of their first container, so the
+# LIST handler can rebuild AzureBlobContainerUrl (the primary identifier)
+# without a request per account.
+PRIMARY_CONTAINER_TAG = 'cfn-primary-container'
+
+# Bounds of a single LIST invocation: models returned per page, and time
+# spent following ARM nextLinks before handing a nextToken back.
+LIST_PAGE_SIZE = int(os.environ.get("LIST_PAGE_SIZE", "100"))
+LIST_TIME_BUDGET_SECONDS = float(os.environ.get("LIST_TIME_BUDGET_SECONDS", "30"))
+
+# Seeding copies S3 objects in batches of AZURE_SEED_CONCURRENCY objects, in
+# parallel; the blocks of a large object share the workers of its batch.  An
+# invocation stops starting batches once its time budget is spent, and the
+# next callback resumes after the last object copied.
+SEED_CONCURRENCY = int(os.environ.get("AZURE_SEED_CONCURRENCY", "8"))
+SEED_TIME_BUDGET_SECONDS = float(os.environ.get("AZURE_SEED_TIME_BUDGET_SECONDS", "60"))
+
+# Defaults of the SharedAccessSignature property.  User delegation keys, and
+# so the signatures made with them, are valid for 7 days at most.
+SAS_TYPE = 'UserDelegation'
+SAS_PERMISSIONS = 'rl'
+SAS_EXPIRY_HOURS = 24
+USER_DELEGATION_MAX_HOURS = 7 * 24
+
+# Signatures are valid from a few minutes in the past, so clients whose
+# clock is a little behind can use them straight away.
+SAS_CLOCK_SKEW = datetime.timedelta(minutes=5)
+
+# Defaults of the Probe property.  The probe waits up to
+# AZURE_PROBE_ENDPOINT_TIMEOUT_SECONDS for the blob endpoint of a new account
+# to resolve and respond, then fails the CREATE as not stabilized.
+PROBE_BLOB_SIZE_KB = 1024
+PROBE_BLOB_COUNT = 8
+PROBE_CONCURRENCY = 4
+PROBE_ENDPOINT_TIMEOUT_SECONDS = float(os.environ.get("AZURE_PROBE_ENDPOINT_TIMEOUT_SECONDS", "600"))
+
+# The probe transfers BlobSizeKB * BlobCount up and down in one invocation:
+# larger probes are rejected, so they cannot outrun the function timeout.
+PROBE_MAX_TOTAL_MB = int(os.environ.get("AZURE_PROBE_MAX_TOTAL_MB", "256"))
+
+# Read-only properties set by the probe, kept as they are by UPDATE.
+PROBE_OUTPUTS = (
+    'AzureProbeEndpointReadySeconds',
+    'AzureProbeUploadMBps',
+    'AzureProbeDownloadMBps',
+    'AzureProbeUploadLatencyP50Ms',
+    'AzureProbeUploadLatencyP99Ms',
+    'AzureProbeDownloadLatencyP50Ms',
+    'AzureProbeDownloadLatencyP99Ms',
+)
+
 @resource.handler(Action.CREATE)
+@metrics.instrument_handler("CREATE")
+@concurrency.invocation_scope
+@credentials.session_scope
+@credentials.required
 def create_handler(
     session: Optional[SessionProxy],
     request: ResourceHandlerRequest,
@@ -76,111 +186,71 @@ def create_handler(
     if _is_callback(
         callback_context,
     ):
-        return _callback_helper(
-            session,
-            request,
-            callback_context,
-            model,
-        )
+        # Callback contexts without a state were written before the CREATE
+        # handler ran as a state machine: fall back to the Read based stabilization.
+        if not state_machine.has_state(callback_context):
+            return _callback_helper(
+                session,
+                request,
+                callback_context,
+                model,
+            )
+        LOG.debug(f"Resuming CREATE at state {state_machine.current_state(callback_context)}")
     # If no callback context is present, then this is a new invocation.
     else:
         LOG.debug("No callback context present")
 
     try:
 
-        # Constants we need in multiple places: the resource group name and the region
-        # in which we provision resources. You can change these values however you want.
-        # TODO: Turn them into CF Parameters
+        if model:
 
-        # Azure Resource Group Details
-        RESOURCE_GROUP_NAME = "Multicloud-Storage-rg"
-        LOCATION = "australiasoutheast"
-        
-        # Azure Storage Account Details
-        STORAGE_ACCOUNT_NAME = f"s3replicatedstorage{random.randint(1,100000):05}"
-        SKU = 'Standard_LRS'
-        KIND = 'StorageV2'
+            _apply_defaults(model)
+
+            # Start a new CREATE, or pick up the one tracked in the callback context
+            if _is_callback(callback_context):
+                context = dict(callback_context)
+            else:
+                _validate_account_settings(model)
+                context = state_machine.new_state_context(
+                    state_machine.CREATE_RG_ENSURE,
+                    nameSeed=_account_name_seed(request),
+                    nameAttempt=0,
+                    clientRequestToken=request.clientRequestToken,
+                )
 
-        # Azure Blob Container Details
-        CONTAINER_NAME = 'blob-container-01'
+            # Every returned model must include the primary identifier, that in this case is the StorageAccountName.
+            # The name is picked by the first state, and kept in the callback context.
+            model.AzureBlobStorageAccountName = context.get("storageAccountName")
 
-        if model:
+            # Run the remaining states; the ones completed by previous invocations are skipped.
+            # A state returns a ProgressEvent when the handler has to be called back later.
+            # Seeding reads from S3 with the credentials CloudFormation passed in
+            steps = {**CREATE_STEPS, state_machine.CREATE_SEED: functools.partial(_create_seed, session=session)}
 
-            # Authenticate to Azure using the Service Principal
-            token = get_azure_token(model) 
+            while state_machine.current_state(context) != state_machine.DONE:
+                event = _run_state(model, context, steps)
+                if event:
+                    return event
+    
+    except exceptions.InvalidRequest as ire:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.InvalidRequest,
+            error_message=str(ire),
+        )
 
-            # Creating Resource Group
-            headers = {'Authorization': 'Bearer ' + token['accessToken']}
-            payload = {'location': LOCATION}
-            url = 'https://management.azure.com/subscriptions/{subscriptionId}/resourceGroups/{resourceGroupName}?api-version=2022-01-01'
-            url = url.format(subscriptionId=model.AzureSubscriptionId, resourceGroupName=RESOURCE_GROUP_NAME)
-            response = requests.put(url, headers=headers, json=payload, timeout=90)
-        
-            # Creating Storage Account
-            payload = {
-                'location': LOCATION,
-                'sku': {
-                    'name': SKU
-                },
-                'kind': KIND
-            }       
-            
-            url = 'https://management.azure.com/subscriptions/{subscriptionId}/resourceGroups/{resourceGroupName}/providers/Microsoft.Storage/storageAccounts/{accountName}?api-version=2021-08-01'
-            url = url.format(subscriptionId=model.AzureSubscriptionId, resourceGroupName=RESOURCE_GROUP_NAME, accountName=STORAGE_ACCOUNT_NAME)
-            
-            # Storage Account creation in Azure is an async operation.
-            # Response code 202 indicates the request has been Accepted
-            response = requests.put(url, headers=headers, json=payload, timeout=90)
+    except exceptions.ResourceConflict as rce:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.ResourceConflict,
+            error_message=str(rce),
+        )
 
-            # Async operation has started
-            if response.status_code == 202:
+    except AzureThrottlingException as te:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.Throttling,
+            error_message=str(te),
+            traceback_content=traceback.format_exc(),
+        )
 
-                # Get the URL for the operation status
-                status_url = response.headers['Location']
-                retry_after = response.headers['Retry-After']
-            
-                # Lets sleep first
-                time.sleep(int(retry_after))
-
-                # Now check the status of the operation
-                while True:
-                    response = requests.get(status_url, headers=headers, timeout=90)
-
-                    # Check the status code
-                    # 202 indicates it's still running
-                    # 200 indicates it has completed
-                    # Anything else, throw an exception
-                                        
-                    if response.status_code == 200:
-                        LOG.info("Storage account creation succeeded!")
-                        break
-                    elif response.status_code == 202:
-                        LOG.info(f"Storage account not yet provisioned")
-                        # Wait before checking again
-                        time.sleep(10)
-                    else:
-                        LOG.info("Storage account creation failed.")
-                        # TODO: Handle the error
-                        break
-
-                # Every returned model must include the primary identifier, that in this case is the StorageAccountName.
-                # Retrieving the primary identifier and setting it in the model.
-                model.AzureBlobStorageAccountName = STORAGE_ACCOUNT_NAME
-                model.AzureResourceGroup = RESOURCE_GROUP_NAME
-
-                # Creating Blob Container
-                url = 'https://{accountName}.blob.core.windows.net/{containerName}?restype=container'
-                url = url.format(accountName=STORAGE_ACCOUNT_NAME, containerName=CONTAINER_NAME)
-
-                # Get a new Azure token for performing Storage Account operations
-                storage_token = get_azure_token_for_storage_account(model)
-                headers = azure_storage_request_header(storage_token)
-                
-                response = requests.put(url, headers=headers, timeout=90)
-                model.AzureBlobContainerUrl = url.split('?')[0]
-
-                LOG.info(f"Blob Container Url: {model.AzureBlobContainerUrl}")
-    
     except Exception as e:
         return _progress_event_failed(
             handler_error_code=HandlerErrorCode.InternalFailure,
@@ -188,12 +258,139 @@ def create_handler(
             traceback_content=traceback.format_exc(),
         )
     
-    return _progress_event_callback(
+    return _progress_event_success(
+        model=model,
+    )
+
+
+@resource.handler(Action.UPDATE)
+@metrics.instrument_handler("UPDATE")
+@concurrency.invocation_scope
+@credentials.session_scope
+@credentials.required
+def update_handler(
+    session: Optional[SessionProxy],
+    request: ResourceHandlerRequest,
+    callback_context: MutableMapping[str, Any],
+) -> ProgressEvent:
+    """Define the UPDATE handler."""
+    LOG.debug("*UPDATE handler*")
+
+    model = request.desiredResourceState
+    previous = request.previousResourceState
+
+    try:
+
+        if not model or not previous:
+            return _progress_event_failed(
+                handler_error_code=HandlerErrorCode.InvalidRequest,
+                error_message="Both the previous and the desired resource states are required to update the resource",
+            )
+
+        # Read-only properties are not always sent back with the desired state,
+        # nor the primary URL with the previous one: it names the first container
+        primary_container = previous.AzureBlobContainerUrl.rsplit('/', 1)[-1] if previous.AzureBlobContainerUrl else _containers(previous)[0].Name
+        model.AzureBlobStorageAccountName = previous.AzureBlobStorageAccountName
+        model.AzureBlobContainerUrl = previous.AzureBlobContainerUrl or _container_url(model, primary_container)
+
+        # The probe only runs on CREATE
+        for name in PROBE_OUTPUTS:
+            setattr(model, name, getattr(previous, name))
+
+        # Resources created before these properties existed got the defaults
+        _apply_defaults(previous)
+        _apply_defaults(model)
+        _validate_account_settings(model)
+
+        # The container in the primary identifier cannot be removed in place
+        if primary_container not in [container.Name for container in _containers(model)]:
+            return _progress_event_failed(
+                handler_error_code=HandlerErrorCode.NotUpdatable,
+                error_message=f"Container {primary_container} is the resource's primary identifier and cannot be removed or renamed",
+            )
+
+        # Fails with NotFound when the account is gone
+        account = get_azure_storage_account(model)
+
+        # Only send what changed: one account PATCH, then the container operations
+        patch = _account_patch(previous, model)
+        if patch:
+            update_azure_storage_account(model, patch)
+
+        # Azure keeps the tier when the template stops setting it: report that one
+        if not model.AzureStorageAccessTier:
+            model.AzureStorageAccessTier = (account.get('properties') or {}).get('accessTier')
+
+        operations = _container_operations(previous, model)
+        if operations:
+            storage_token = get_azure_token_for_storage_account(model)
+            results = concurrency.gather(
+                *[functools.partial(operation, model, container, storage_token) for operation, container in operations],
+                max_workers=CONTAINER_CONCURRENCY,
+            )
+
+            # Containers with the name of one being deleted cannot be created yet:
+            # apply the update again on a later callback, every operation is idempotent
+            pending = [container.Name for (operation, container), result in zip(operations, results) if operation is _create_container and result is None]
+            if pending:
+                LOG.info(f"Blob containers still being deleted: {pending}")
+                context = {**CALLBACK_STATUS_IN_PROGRESS, **callback_context}
+                return _progress_event_callback(
+                    model=model,
+                    callback_context=context,
+                    callback_delay_seconds=_poll_delay(context),
+                )
+
+        model.AzureBlobContainerUrls = [_container_url(model, container.Name) for container in _containers(model)]
+
+        # Sign the SAS again, so every update hands out a fresh one
+        _apply_shared_access_signature(model)
+
+        LOG.info(f"Updated storage account {model.AzureBlobStorageAccountName}: {len(patch)} account and {len(operations)} container changes")
+
+    except exceptions.InvalidRequest as ire:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.InvalidRequest,
+            error_message=str(ire),
+        )
+
+    except exceptions.NotUpdatable as nue:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.NotUpdatable,
+            error_message=str(nue),
+        )
+
+    except ResourceNotFoundException as rnfe:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.NotFound,
+            error_message=str(rnfe),
+            traceback_content=traceback.format_exc(),
+        )
+
+    except AzureThrottlingException as te:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.Throttling,
+            error_message=str(te),
+            traceback_content=traceback.format_exc(),
+        )
+
+    except Exception as e:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.InternalFailure,
+            error_message=str(e),
+            traceback_content=traceback.format_exc(),
+        )
+
+    return _progress_event_success(
         model=model,
     )
 
 
 @resource.handler(Action.DELETE)
+@metrics.instrument_handler("DELETE")
+@concurrency.invocation_scope
+@credentials.session_scope
+@credentials.required
 def delete_handler(
     session: Optional[SessionProxy],
     request: ResourceHandlerRequest,
@@ -212,26 +409,25 @@ def delete_handler(
 
     try:
 
-        # Call the Read handler to look for the resource, and return a
-        # NotFound handler error code if the resource is not found.
-        rh = read_handler(
-            session,
-            request,
-            callback_context,
-        )
+        if _is_callback(callback_context) and state_machine.has_state(callback_context):
+            LOG.debug(f"Resuming DELETE at state {state_machine.current_state(callback_context)}")
+            context = dict(callback_context)
+        else:
 
-        if rh.errorCode:
-            if rh.errorCode == HandlerErrorCode.NotFound or rh.errorCode == HandlerErrorCode.InternalFailure:
-                return _progress_event_failed(
-                    handler_error_code=HandlerErrorCode.NotFound,
-                    error_message=str(rh.message),
-                    traceback_content=None,
-                )
+            # No Read handler call up front: Azure answers the DELETE itself
+            # with a 204 when the account does not exist, which is reported
+            # with a NotFound handler error code.  This saves a round trip.
+            context = state_machine.new_state_context(
+                state_machine.DELETE_CONTAINERS_DELETE if DELETE_CONTAINERS_FIRST else state_machine.DELETE_ACCOUNT_DELETE,
+            )
             
         if model:
 
-            # Delete the Blob Storage
-            delete_azure_storage_account(model)
+            # Delete the Blob Storage, and wait for Azure to complete the deletion
+            while state_machine.current_state(context) != state_machine.DONE:
+                event = _run_state(model, context, DELETE_STEPS)
+                if event:
+                    return event
 
     except ResourceNotFoundException as rnfe:
         return _progress_event_failed(
@@ -240,6 +436,13 @@ def delete_handler(
             traceback_content=traceback.format_exc(),
         )
 
+    except AzureThrottlingException as te:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.Throttling,
+            error_message=str(te),
+            traceback_content=traceback.format_exc(),
+        )
+
     except Exception as e:
         return _progress_event_failed(
             handler_error_code=HandlerErrorCode.InternalFailure,
@@ -254,6 +457,10 @@ def delete_handler(
 
 
 @resource.handler(Action.READ)
+@metrics.instrument_handler("READ")
+@concurrency.invocation_scope
+@credentials.session_scope
+@credentials.required
 def read_handler(
     session: Optional[SessionProxy],
     request: ResourceHandlerRequest,
@@ -270,7 +477,7 @@ def read_handler(
     )
     LOG.debug(f"Progress status: {progress.status}")
 
-    LOG.info(f"Model: {model}")
+    LOG.debug(f"Model: {_redacted(model)}")
 
     try:
         model_blobcontainerurl = ""
@@ -279,12 +486,17 @@ def read_handler(
             model_blobcontainerurl = model.AzureBlobContainerUrl
             model_storageaccountname = model.AzureBlobStorageAccountName
 
-        response = get_azure_storage_account(model)
+        account = get_azure_storage_account(model)
+
+        # The primary identifier is the container's URL: it must exist too
+        if model and model.AzureBlobContainerUrl:
+            get_azure_blob_container(model.AzureBlobContainerUrl, get_azure_token_for_storage_account(model))
 
-        if response.status_code == 200 and model:
+        if model:
 
             model.AzureBlobContainerUrl = model_blobcontainerurl
             model.AzureBlobStorageAccountName = model_storageaccountname
+            _apply_account_settings(model, account)
             
             model.AzureResourceGroup = model.AzureResourceGroup
             model.AzureSubscriptionId = model.AzureSubscriptionId
@@ -299,6 +511,13 @@ def read_handler(
             traceback_content=traceback.format_exc(),
         )
 
+    except AzureThrottlingException as te:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.Throttling,
+            error_message=str(te),
+            traceback_content=traceback.format_exc(),
+        )
+
     except Exception as e:
         return _progress_event_failed(
             handler_error_code=HandlerErrorCode.InternalFailure,
@@ -311,8 +530,90 @@ def read_handler(
     )
 
 
+@resource.handler(Action.LIST)
+@metrics.instrument_handler("LIST")
+@concurrency.invocation_scope
+@credentials.session_scope
+@credentials.required
+def list_handler(
+    session: Optional[SessionProxy],
+    request: ResourceHandlerRequest,
+    callback_context: MutableMapping[str, Any],
+) -> ProgressEvent:
+    """Define the LIST handler."""
+    LOG.debug("*LIST handler*")
+
+    model = request.desiredResourceState
+
+    try:
+
+        if not model or not model.AzureSubscriptionId:
+            return _progress_event_failed(
+                handler_error_code=HandlerErrorCode.InvalidRequest,
+                error_message="AzureSubscriptionId, AzureClientId, AzureTenantId and AzureClientSecret are required to list storage accounts",
+            )
+
+        # Resume from the ARM page, and the position in it, where the
+        # previous page of models stopped
+        link, skip = _decode_next_token(model, request.nextToken)
+
+        models: List[ResourceModel] = []
+        next_token = None
+        deadline = time.monotonic() + LIST_TIME_BUDGET_SECONDS
+
+        # Only one ARM page is held in memory at a time
+        while link:
+            page = list_azure_storage_accounts(model, link)
+            accounts = page.get('value', [])
+
+            for position in range(skip, len(accounts)):
+                if len(models) == LIST_PAGE_SIZE:
+                    next_token = _encode_next_token(link, position)
+                    break
+                models.append(_listed_model(model, accounts[position]))
+
+            if next_token:
+                break
+
+            link, skip = page.get('nextLink'), 0
+            if link and (len(models) == LIST_PAGE_SIZE or time.monotonic() > deadline):
+                next_token = _encode_next_token(link, 0)
+                break
+
+        LOG.info(f"Listed {len(models)} storage accounts, more to come: {bool(next_token)}")
+
+    except AzureThrottlingException as te:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.Throttling,
+            error_message=str(te),
+            traceback_content=traceback.format_exc(),
+        )
+
+    except ValueError as ve:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.InvalidRequest,
+            error_message=str(ve),
+            traceback_content=traceback.format_exc(),
+        )
+
+    except Exception as e:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.InternalFailure,
+            error_message=str(e),
+            traceback_content=traceback.format_exc(),
+        )
+
+    return _progress_event_success(
+        models=models,
+        is_list_handler=True,
+        next_token=next_token,
+    )
+
+
 def _progress_event_callback(
     model: Optional[ResourceModel],
+    callback_context: Optional[MutableMapping[str, Any]] = None,
+    callback_delay_seconds: int = CALLBACK_DELAY_SECONDS,
 ) -> ProgressEvent:
     """Return a ProgressEvent indicating a callback should occur next."""
     LOG.debug("_progress_event_callback()")
@@ -320,8 +621,8 @@ def _progress_event_callback(
     return ProgressEvent(
         status=OperationStatus.IN_PROGRESS,
         resourceModel=model,
-        callbackContext=CALLBACK_STATUS_IN_PROGRESS,
-        callbackDelaySeconds=CALLBACK_DELAY_SECONDS,
+        callbackContext=callback_context or CALLBACK_STATUS_IN_PROGRESS,
+        callbackDelaySeconds=callback_delay_seconds,
     )
 
 
@@ -330,6 +631,7 @@ def _progress_event_success(
     models: Any = None,
     is_delete_handler: bool = False,
     is_list_handler: bool = False,
+    next_token: Optional[str] = None,
 ) -> ProgressEvent:
     """Return a ProgressEvent indicating a success."""
     LOG.debug("_progress_event_success()")
@@ -353,11 +655,13 @@ def _progress_event_success(
         return ProgressEvent(
             status=OperationStatus.SUCCESS,
         )
-    # In the case of the List handler, return the status and 'resourceModels'.
+    # In the case of the List handler, return the status, 'resourceModels'
+    # and the 'nextToken' of the next page, if any.
     elif is_list_handler:
         return ProgressEvent(
             status=OperationStatus.SUCCESS,
             resourceModels=models,
+            nextToken=next_token,
         )
     else:
         return ProgressEvent(
@@ -382,6 +686,8 @@ def _progress_event_failed(
         LOG.critical(log_entry)
     elif handler_error_code == HandlerErrorCode.NotFound:
         LOG.error(log_entry)
+    elif handler_error_code == HandlerErrorCode.Throttling:
+        LOG.warning(log_entry)
     return ProgressEvent.failed(
         handler_error_code,
         f"Error: {error_message}",
@@ -413,22 +719,11 @@ def _callback_helper(
     """Define a callback logic used for resource stabilization."""
     LOG.debug("_callback_helper()")
 
-    # Call the Read handler to determine status.
-    rh = read_handler(
-        session,
-        request,
-        callback_context,
-    )
-    LOG.debug(f"Callback: Read handler status: {rh.status}")
-
-    # Return success if the Read handler returns success.
-    if rh.status == OperationStatus.SUCCESS:
-        return _progress_event_success(
-            model=model,
-        )
-    elif rh.errorCode:
-        LOG.debug(f"Callback: Read handler error code: {rh.errorCode}")
-        if rh.errorCode == HandlerErrorCode.NotFound and is_delete_handler:
+    # Check the account's provisioning state and its containers to determine status.
+    try:
+        reason = _readiness(model)
+    except ResourceNotFoundException as rnfe:
+        if is_delete_handler:
             LOG.debug("NotFound error in Delete handler: returning success")
 
             # Return a success status if the resource is not found
@@ -439,43 +734,1153 @@ def _callback_helper(
             return _progress_event_success(
                 is_delete_handler=True,
             )
-        elif rh.errorCode == HandlerErrorCode.NotFound:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.NotFound,
+            error_message=str(rnfe),
+            traceback_content=None,
+        )
+    except AzureThrottlingException as te:
+        LOG.warning(f"Azure throttled the stabilization check: {te}")
+        reason = "throttled"
+    except Exception as e:
+        return _progress_event_failed(
+            handler_error_code=HandlerErrorCode.InternalFailure,
+            error_message=str(e),
+            traceback_content=traceback.format_exc(),
+        )
+
+    # Return success once the resource is ready.
+    if reason is None and not is_delete_handler:
+        return _progress_event_success(
+            model=model,
+        )
+
+    # Otherwise, call this handler again by using a callback logic.
+    LOG.debug(f"Callback: resource not ready: {reason}")
+    return _progress_event_callback(
+        model=model,
+    )
+    
+# CREATE and DELETE pipeline states.  Each state does its Azure calls, then
+# either moves the pipeline to the next state, or returns a ProgressEvent to
+# be called back later (e.g. while a long running Azure operation is running).
+def _create_rg_ensure(model: ResourceModel, context: MutableMapping[str, Any]) -> Optional[ProgressEvent]:
+
+    # The resource group lookup and the first name check are independent:
+    # they go to ARM as one batch
+    lookups = {}
+    if not resource_group_cache.is_known(model.AzureSubscriptionId, model.AzureResourceGroup):
+        lookups['group'] = arm_batch.ArmRequest('GET', _resource_group_url(model) + '?api-version=2022-01-01')
+    if not context.get("storageAccountName"):
+        lookups['name'] = _name_availability_request(model, _account_name(context["nameSeed"], context.get("nameAttempt", 0)))
+
+    # The storage token is only needed once the account exists, fetching it
+    # now takes it off the critical path of the container creation
+    responses, _ = concurrency.gather(
+        lambda: dict(zip(lookups, arm_batch.send(list(lookups.values()), _management_headers(model)))),
+        concurrency.prefetch(lambda: get_azure_token_for_storage_account(model)),
+    )
+
+    concurrency.gather(
+        lambda: _ensure_resource_group(model, responses.get('group')),
+        lambda: _reserve_account_name(model, context, responses.get('name')),
+    )
+
+    state_machine.transition(context, state_machine.CREATE_ACCOUNT_PUT)
+    return None
+
+
+def _reserve_account_name(model: ResourceModel, context: MutableMapping[str, Any], first_check: Any = None) -> None:
+    """Pick the first available storage account name, and keep it in the context.
+
+    first_check is the response to the check of the first candidate name,
+    when it was already sent, e.g. in a batch.
+    """
+
+    # Contexts written before names were checked already carry the name
+    if context.get("storageAccountName"):
+        model.AzureBlobStorageAccountName = context["storageAccountName"]
+        return
+
+    for attempt in range(context.get("nameAttempt", 0), ACCOUNT_NAME_MAX_ATTEMPTS):
+        name = _account_name(context["nameSeed"], attempt)
+        if first_check is not None and attempt == context.get("nameAttempt", 0):
+            available, reason = _name_availability(first_check)
+        else:
+            available, reason = check_azure_storage_account_name(model, name)
+
+        # A name taken by this very CREATE, e.g. before a retry, is still ours
+        if not available and reason == 'AlreadyExists':
+            available = _is_own_account(model, name, context.get("clientRequestToken"))
+
+        if available:
+            context["nameAttempt"] = attempt
+            context["storageAccountName"] = name
+            model.AzureBlobStorageAccountName = name
+            return
+
+        LOG.info(f"Storage account name {name} is not available: {reason}")
+
+    raise exceptions.ResourceConflict(f"No storage account name available after {ACCOUNT_NAME_MAX_ATTEMPTS} attempts")
+
+
+def _account_name_seed(request: ResourceHandlerRequest) -> str:
+    """Stack and logical IDs identify the resource; requests without them get a random seed."""
+    if request.stackId and request.logicalResourceIdentifier:
+        return f"{request.stackId}/{request.logicalResourceIdentifier}"
+
+    return f"{random.getrandbits(64):016x}"
+
+
+def _account_name(seed: str, attempt: int) -> str:
+    digest = hashlib.sha256(f"{seed}/{attempt}".encode()).hexdigest()
+    return ACCOUNT_NAME_PREFIX + digest[:ACCOUNT_NAME_HASH_LENGTH]
+
+
+def _is_own_account(model: ResourceModel, name: str, client_request_token: Optional[str]) -> bool:
+    if not client_request_token:
+        return False
+
+    candidate = ResourceModel._deserialize({**model._serialize(), 'AzureBlobStorageAccountName': name})
+    try:
+        account = get_azure_storage_account(candidate, use_cache=False)
+    except ResourceNotFoundException:
+        return False
+
+    return (account.get('tags') or {}).get(REQUEST_TOKEN_TAG) == client_request_token
+
+
+def _ensure_resource_group(model: ResourceModel, response: Any = None) -> None:
+    """Create the resource group unless it exists; response is the answer to
+    a lookup of the group, when it was already sent, e.g. in a batch."""
+
+    # Resource groups already seen by this container are not checked again
+    if resource_group_cache.is_known(model.AzureSubscriptionId, model.AzureResourceGroup):
+        LOG.debug(f"Resource group {model.AzureResourceGroup} is known to exist")
+        return
+
+    # Authenticate to Azure using the Service Principal
+    headers = _management_headers(model)
+
+    url = _resource_group_url(model) + '?api-version=2022-01-01'
+
+    # A HEAD draws on the read quota, and spares a write when the group exists
+    if response is None:
+        response = http_client.request('HEAD', url, headers=headers)
+
+    if response.status_code == 404:
+
+        # Creating Resource Group
+        payload = {'location': model.AzureLocation, 'tags': {RESOURCE_GROUP_OWNER_TAG: TYPE_NAME}}
+        response = http_client.request('PUT', url, headers=headers, json=payload)
+
+        if response.status_code not in (200, 201):
+            raise Exception(f"ERROR: {response.status_code} - {response.content}")
+    elif response.status_code not in (200, 204):
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
+
+    resource_group_cache.remember(model.AzureSubscriptionId, model.AzureResourceGroup)
+
+
+def _create_account_put(model: ResourceModel, context: MutableMapping[str, Any]) -> Optional[ProgressEvent]:
+
+    token = get_azure_token(model) 
+    headers = {'Authorization': 'Bearer ' + token['accessToken']}
+
+    # Creating Storage Account
+    payload = {
+        'location': model.AzureLocation,
+        'sku': {
+            'name': model.AzureStorageSku
+        },
+        'kind': model.AzureStorageKind,
+        'tags': {PRIMARY_CONTAINER_TAG: _containers(model)[0].Name},
+        'properties': {},
+    }       
+
+    if context.get('clientRequestToken'):
+        payload['tags'][REQUEST_TOKEN_TAG] = context['clientRequestToken']
+
+    if model.AzureStorageAccessTier:
+        payload['properties']['accessTier'] = model.AzureStorageAccessTier
+
+    # Containers cannot be made public in an account that disallows public access
+    if any(_public_access(container) for container in _containers(model)):
+        payload['properties']['allowBlobPublicAccess'] = True
+    
+    url = '{managementUrl}/subscriptions/{subscriptionId}/resourceGroups/{resourceGroupName}/providers/Microsoft.Storage/storageAccounts/{accountName}?api-version=2021-08-01'
+    url = url.format(managementUrl=endpoints.management_url(), subscriptionId=model.AzureSubscriptionId, resourceGroupName=model.AzureResourceGroup, accountName=model.AzureBlobStorageAccountName)
+    
+    # Storage Account creation in Azure is an async operation.
+    # Response code 202 indicates the request has been Accepted
+    response = http_client.request('PUT', url, headers=headers, json=payload)
+    read_cache.invalidate(_storage_account_id(model))
+
+    if response.status_code == 202:
+        LOG.info(f"Storage account not yet provisioned")
+
+        # Poll the operation status URL on the next invocation
+        state_machine.transition(context, state_machine.CREATE_ACCOUNT_POLL, operation_url=response.headers['Location'])
+        return _progress_event_callback(
+            model=model,
+            callback_context=context,
+            callback_delay_seconds=_poll_delay(context, response, estimate_key=_provisioning_key(model)),
+        )
+    elif response.status_code == 200 and _provisioning_state(response.json()) != 'Succeeded':
+
+        # The account exists, but is not ready yet: poll it
+        state_machine.transition(context, state_machine.CREATE_ACCOUNT_POLL)
+        return None
+    elif response.status_code == 200:
+        LOG.info("Storage account creation succeeded!")
+    elif response.status_code == 404 and 'ResourceGroupNotFound' in response.text:
+
+        # The resource group was deleted since it was seen: create it again
+        LOG.info(f"Resource group {model.AzureResourceGroup} no longer exists")
+        resource_group_cache.forget(model.AzureSubscriptionId, model.AzureResourceGroup)
+
+        context["resourceGroupAttempt"] = context.get("resourceGroupAttempt", 0) + 1
+        if context["resourceGroupAttempt"] > RESOURCE_GROUP_MAX_ATTEMPTS:
+            raise Exception(f"ERROR: {response.status_code} - {response.content}")
+        state_machine.transition(context, state_machine.CREATE_RG_ENSURE)
+        return None
+    elif response.status_code == 409 and 'ResourceGroupBeingDeleted' in response.text:
+
+        # An empty resource group is being cleaned up: wait, then create it again
+        LOG.info(f"Resource group {model.AzureResourceGroup} is being deleted")
+        resource_group_cache.forget(model.AzureSubscriptionId, model.AzureResourceGroup)
+        state_machine.transition(context, state_machine.CREATE_RG_ENSURE)
+        return _progress_event_callback(
+            model=model,
+            callback_context=context,
+            callback_delay_seconds=_poll_delay(context, response),
+        )
+    elif response.status_code == 409 and 'StorageAccountAlreadyTaken' in response.text:
+
+        # Someone took the name since it was checked: stay in this state, with the next name
+        LOG.info(f"Storage account name {model.AzureBlobStorageAccountName} was taken, picking another one")
+        context["nameAttempt"] = context.get("nameAttempt", 0) + 1
+        context.pop("storageAccountName", None)
+        _reserve_account_name(model, context)
+        return None
+    else:
+        LOG.info("Storage account creation failed.")
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
+
+    state_machine.transition(context, state_machine.CREATE_CONTAINER_PUT)
+    return None
+
+
+def _create_account_poll(model: ResourceModel, context: MutableMapping[str, Any]) -> Optional[ProgressEvent]:
+
+    if context.get("operationUrl"):
+        token = get_azure_token(model) 
+        headers = {'Authorization': 'Bearer ' + token['accessToken']}
+
+        response = http_client.request('GET', context["operationUrl"], headers=headers)
+        account = response.json() if response.status_code == 200 else {}
+    else:
+
+        # The account existed already, e.g. on a retried CREATE: watch it directly
+        response = None
+        account = get_azure_storage_account(model, use_cache=False)
+
+    # Check the status code and the provisioning state
+    # 202, or a 200 with a provisioning state still moving, indicates it's still running
+    # 200 with a Succeeded provisioning state indicates it has completed
+    # Anything else, throw an exception
+    if response is not None and response.status_code == 202:
+        provisioning_state = 'Accepted'
+    else:
+        provisioning_state = _provisioning_state(account) or 'Succeeded'
+
+    if response is not None and response.status_code not in (200, 202):
+        LOG.info("Storage account creation failed.")
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
+    elif provisioning_state in FAILED_PROVISIONING_STATES:
+        LOG.info("Storage account creation failed.")
+        raise Exception(f"ERROR: Storage account {model.AzureBlobStorageAccountName} provisioning {provisioning_state}")
+    elif provisioning_state != 'Succeeded':
+        LOG.info(f"Storage account not yet provisioned: {provisioning_state}")
+        return _progress_event_callback(
+            model=model,
+            callback_context=context,
+            callback_delay_seconds=_poll_delay(context, response),
+        )
+    else:
+        LOG.info("Storage account creation succeeded!")
+
+        # Learn how long accounts like this one take, to time the first poll of the next ones
+        started = context["stateEnteredAt"].get(state_machine.CREATE_ACCOUNT_PUT)
+        if started:
+            polling.record_duration(_provisioning_key(model), time.time() - started)
+
+    state_machine.transition(context, state_machine.CREATE_CONTAINER_PUT)
+    return None
+
+
+def _create_container_put(model: ResourceModel, context: MutableMapping[str, Any]) -> Optional[ProgressEvent]:
+
+    containers = _containers(model)
+
+    # Get a new Azure token for performing Storage Account operations
+    storage_token = get_azure_token_for_storage_account(model)
+
+    # Creating Blob Containers, all at once
+    urls = concurrency.gather(
+        *[functools.partial(_create_container, model, container, storage_token) for container in containers],
+        max_workers=CONTAINER_CONCURRENCY,
+    )
+
+    # Containers with the name of one being deleted cannot be created yet:
+    # create them on a later callback, the others are left as they are
+    if None in urls:
+        LOG.info(f"Blob containers still being deleted: {[c.Name for c, url in zip(containers, urls) if url is None]}")
+        return _progress_event_callback(
+            model=model,
+            callback_context=context,
+            callback_delay_seconds=_poll_delay(context),
+        )
+
+    model.AzureBlobContainerUrls = urls
+    model.AzureBlobContainerUrl = urls[0]
+
+    LOG.info(f"Blob Container Urls: {model.AzureBlobContainerUrls}")
+
+    state_machine.transition(context, _after_containers(model, state_machine.CREATE_CONTAINER_PUT))
+    return None
+
+
+def _create_probe(model: ResourceModel, context: MutableMapping[str, Any]) -> Optional[ProgressEvent]:
+    """Wait for the blob endpoint of the account to resolve and respond, then
+    measure the throughput and latency of the primary container.
+
+    The wait spans callbacks; the measurement runs in one invocation.
+    """
+    settings = model.Probe
+    entered = context["stateEnteredAt"][state_machine.CREATE_PROBE]
+
+    # Get a new Azure token for performing Storage Account operations
+    storage_token = get_azure_token_for_storage_account(model)
+
+    if not probe.resolves(model.AzureBlobContainerUrl):
+        reason = "does not resolve"
+    else:
+        try:
+            get_azure_blob_container(model.AzureBlobContainerUrl, storage_token)
+            reason = None
+        except Exception as e:
+            reason = f"does not respond: {e}"
+
+    if reason:
+        if time.time() - entered > PROBE_ENDPOINT_TIMEOUT_SECONDS:
             return _progress_event_failed(
-                handler_error_code=rh.errorCode,
-                error_message=rh.message,
-                traceback_content=None,
+                handler_error_code=HandlerErrorCode.NotStabilized,
+                error_message=f"Blob endpoint of {model.AzureBlobStorageAccountName} {reason} after {PROBE_ENDPOINT_TIMEOUT_SECONDS:.0f} seconds",
             )
-    # Otherwise, call this handler again by using a callback logic.
+        LOG.info(f"Blob endpoint of {model.AzureBlobStorageAccountName} {reason}, probing again later")
+        return _progress_event_callback(
+            model=model,
+            callback_context=context,
+            callback_delay_seconds=_poll_delay(context),
+        )
+
+    model.AzureProbeEndpointReadySeconds = round(time.time() - entered, 3)
+
+    results = probe.run(
+        model.AzureBlobContainerUrl,
+        azure_storage_request_header(storage_token),
+        (settings.BlobSizeKB or PROBE_BLOB_SIZE_KB) * 1024,
+        settings.BlobCount or PROBE_BLOB_COUNT,
+        settings.Concurrency or PROBE_CONCURRENCY,
+    )
+    for name, value in results.items():
+        setattr(model, f"AzureProbe{name}", value)
+
+    LOG.info(f"Probed {model.AzureBlobContainerUrl}: {results}")
+
+    state_machine.transition(context, _after_containers(model, state_machine.CREATE_PROBE))
+    return None
+
+
+def _after_containers(model: ResourceModel, state: str) -> str:
+    """Return the first state state can move to that the model asks for;
+    the probe and the seeding are optional."""
+    wanted = {state_machine.CREATE_PROBE: model.Probe, state_machine.CREATE_SEED: model.Seed}
+
+    return next(name for name in state_machine.TRANSITIONS[state] if wanted.get(name, True))
+
+
+def _create_seed(model: ResourceModel, context: MutableMapping[str, Any], session: Optional[SessionProxy] = None) -> Optional[ProgressEvent]:
+    """Copy the S3 objects listed by model.Seed into their Blob container.
+
+    Objects are copied in key order, a batch at a time.  The blocks staged
+    so far in the current batch, and the key of the last object of the last
+    batch committed, are kept in the callback context, so a callback, or a
+    retry after throttling, picks up from the next block.
+    """
+    seed = model.Seed
+    progress = context.setdefault("seed", {"startAfter": None, "objects": 0, "bytes": 0, "serverSide": True, "batch": None})
+
+    if session is None:
+        raise exceptions.InvalidRequest("Seed needs AWS credentials to read from S3, and none were passed to the handler")
+    s3 = session.client("s3")
+
+    # Get a new Azure token for performing Storage Account operations
+    storage_token = get_azure_token_for_storage_account(model)
+    container_url = _container_url(model, seed.Container or _containers(model)[0].Name)
+    headers = azure_storage_request_header(storage_token)
+
+    deadline = time.monotonic() + SEED_TIME_BUDGET_SECONDS
+    page: List[Mapping[str, Any]] = []
+    next_start_after = progress["startAfter"]
+    listed = False
+
+    while True:
+        if not progress.get("batch"):
+            if not page:
+                if listed and next_start_after is None:
+                    break
+                if listed:
+                    # Every object of the previous page is copied
+                    progress["startAfter"] = next_start_after
+                page, next_start_after = seeding.list_objects(s3, seed.S3Bucket, seed.S3Prefix or '', progress["startAfter"])
+                listed = True
+                continue
+
+            progress["batch"] = [
+                {"key": obj["Key"], "size": obj["Size"], "serverSide": progress["serverSide"], "next": 0, "done": [], "committed": False}
+                for obj in page[:SEED_CONCURRENCY]
+            ]
+            page = page[SEED_CONCURRENCY:]
+
+        if not _seed_batch(seed, s3, container_url, headers, progress, deadline):
+            LOG.info(f"Seeded {progress['objects']} objects so far, resuming the batch after {progress['startAfter']} on the next callback")
+            return _progress_event_callback(
+                model=model,
+                callback_context=context,
+                callback_delay_seconds=1,
+            )
+
+        batch = progress["batch"]
+        progress["batch"] = None
+        progress["startAfter"] = batch[-1]["key"]
+        progress["objects"] += len(batch)
+        progress["bytes"] += sum(obj["size"] for obj in batch)
+
+    LOG.info(f"Seeded {progress['objects']} objects, {progress['bytes']} bytes, from s3://{seed.S3Bucket}/{seed.S3Prefix or ''}")
+
+    state_machine.transition(context, state_machine.CREATE_SAS)
+    return None
+
+
+def _seed_batch(seed: Any, s3: Any, container_url: str, headers: Mapping[str, str], progress: MutableMapping[str, Any], deadline: float) -> bool:
+    """Stage the remaining blocks of the objects of the current batch, all
+    through one pool of AZURE_SEED_CONCURRENCY workers, and commit every
+    object whose blocks are all staged.  Returns False when the deadline
+    passed first.
+
+    An object keeps, in the callback context, how many of its blocks are
+    staged from its first one on, and the ones staged past those.
+    """
+    batch = progress["batch"]
+
+    while True:
+        tasks = []
+        for obj in batch:
+            if obj["committed"]:
+                continue
+            source_url = seeding.presigned_url(s3, seed.S3Bucket, obj["key"]) if obj["serverSide"] else None
+            for index, block in enumerate(seeding.blocks(obj["size"], obj["serverSide"])):
+                if index >= obj["next"] and index not in obj["done"]:
+                    tasks.append((obj, index, functools.partial(
+                        seeding.stage_block, s3, seed.S3Bucket, obj["key"], seeding.blob_url(container_url, obj["key"]), headers, source_url, block,
+                    )))
+
+        unreachable = []
+
+        def staged(task: int, copied: bool) -> None:
+            obj, index, _ = tasks[task]
+            if not copied:
+                unreachable.append(obj)
+                return
+            obj["done"].append(index)
+            while obj["next"] in obj["done"]:
+                obj["done"].remove(obj["next"])
+                obj["next"] += 1
+
+        concurrency.gather_until([call for _, _, call in tasks], deadline, staged, max_workers=SEED_CONCURRENCY)
+
+        # Once Azure could not read from S3, stream the object again from its
+        # first block, and the remaining objects straight away
+        for obj in batch:
+            if obj in unreachable:
+                obj.update({"serverSide": False, "next": 0, "done": []})
+                progress["serverSide"] = False
+
+        ready = [obj for obj in batch if not obj["committed"] and obj["next"] == len(seeding.blocks(obj["size"], obj["serverSide"]))]
+        concurrency.gather(
+            *[
+                functools.partial(
+                    seeding.commit,
+                    seeding.blob_url(container_url, obj["key"]),
+                    headers,
+                    [block_id for block_id, _, _ in seeding.blocks(obj["size"], obj["serverSide"])],
+                )
+                for obj in ready
+            ],
+            max_workers=SEED_CONCURRENCY,
+        )
+        for obj in ready:
+            obj["committed"] = True
+
+        if all(obj["committed"] for obj in batch):
+            return True
+        if not unreachable or time.monotonic() >= deadline:
+            return False
+
+
+def _create_sas(model: ResourceModel, context: MutableMapping[str, Any]) -> Optional[ProgressEvent]:
+
+    _apply_shared_access_signature(model)
+
+    state_machine.transition(context, state_machine.DONE)
+    return None
+
+
+def _apply_shared_access_signature(model: ResourceModel) -> None:
+    """Sign a SAS for the primary container, as model.SharedAccessSignature
+    asks, and set it on the model; clear it when none is asked for.
+
+    Only the signing key is fetched from Azure, once; the signature itself
+    is computed locally.
+    """
+    settings = model.SharedAccessSignature
+    if not settings:
+        model.AzureBlobContainerSasUrl = None
+        model.AzureBlobContainerSasExpiry = None
+        return
+
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    start = now - SAS_CLOCK_SKEW
+    expiry = now + datetime.timedelta(hours=settings.ExpiryHours or SAS_EXPIRY_HOURS)
+    container_name = model.AzureBlobContainerUrl.rsplit('/', 1)[-1]
+    permissions = settings.Permissions or SAS_PERMISSIONS
+
+    if (settings.Type or SAS_TYPE) == 'AccountKey':
+        signature = sas.container_sas(
+            model.AzureBlobStorageAccountName,
+            container_name,
+            permissions,
+            start,
+            expiry,
+            account_key=get_azure_storage_account_key(model),
+        )
+    else:
+        signature = sas.container_sas(
+            model.AzureBlobStorageAccountName,
+            container_name,
+            permissions,
+            start,
+            expiry,
+            user_delegation_key=get_azure_user_delegation_key(model, start, expiry),
+        )
+
+    model.AzureBlobContainerSasUrl = f"{model.AzureBlobContainerUrl}?{signature}"
+    model.AzureBlobContainerSasExpiry = sas.format_time(expiry)
+    LOG.info(f"Signed a {settings.Type or SAS_TYPE} SAS for {model.AzureBlobContainerUrl}, expiring at {model.AzureBlobContainerSasExpiry}")
+
+
+def _create_container(model: ResourceModel, container: Container, storage_token: str) -> Optional[str]:
+    """Create the container, and return its URL; None while a container of
+    the same name is still being deleted."""
+
+    url = _container_url(model, container.Name) + '?restype=container'
+
+    headers = azure_storage_request_header(storage_token)
+
+    public_access = _public_access(container)
+    if public_access:
+        headers['x-ms-blob-public-access'] = public_access
+
+    for name, value in (container.Metadata or {}).items():
+        headers[f'x-ms-meta-{name}'] = value
+
+    response = http_client.request('PUT', url, headers=headers)
+
+    # 409 ContainerAlreadyExists means the container was created by a previous attempt of this state
+    error_code = _blob_error_code(response)
+    if response.status_code == 409 and error_code == 'ContainerBeingDeleted':
+        return None
+    if response.status_code != 201 and not (response.status_code == 409 and error_code == 'ContainerAlreadyExists'):
+        raise Exception(f"ERROR: {container.Name}: {response.status_code} - {response.content}")
+
+    return url.split('?')[0]
+
+
+def _delete_container(model: ResourceModel, container: Container, storage_token: str) -> None:
+
+    url = _container_url(model, container.Name) + '?restype=container'
+    response = http_client.request('DELETE', url, headers=azure_storage_request_header(storage_token))
+
+    # 404 means the container is already gone
+    if response.status_code not in (202, 404):
+        raise Exception(f"ERROR: {container.Name}: {response.status_code} - {response.content}")
+
+
+def _set_container_public_access(model: ResourceModel, container: Container, storage_token: str) -> None:
+
+    # Without the header, the container becomes private
+    url = _container_url(model, container.Name) + '?restype=container&comp=acl'
+    headers = azure_storage_request_header(storage_token)
+
+    public_access = _public_access(container)
+    if public_access:
+        headers['x-ms-blob-public-access'] = public_access
+
+    response = http_client.request('PUT', url, headers=headers)
+
+    if response.status_code != 200:
+        raise Exception(f"ERROR: {container.Name}: {response.status_code} - {response.content}")
+
+
+def _set_container_metadata(model: ResourceModel, container: Container, storage_token: str) -> None:
+
+    # The metadata sent replaces all of the container's metadata
+    url = _container_url(model, container.Name) + '?restype=container&comp=metadata'
+    headers = azure_storage_request_header(storage_token)
+
+    for name, value in (container.Metadata or {}).items():
+        headers[f'x-ms-meta-{name}'] = value
+
+    response = http_client.request('PUT', url, headers=headers)
+
+    if response.status_code != 200:
+        raise Exception(f"ERROR: {container.Name}: {response.status_code} - {response.content}")
+
+
+def _container_operations(previous: ResourceModel, model: ResourceModel):
+    """Container operations turning the previous containers into the desired ones."""
+    before = {container.Name: container for container in _containers(previous)}
+    after = {container.Name: container for container in _containers(model)}
+
+    operations = []
+    for name, container in after.items():
+        if name not in before:
+            operations.append((_create_container, container))
+            continue
+
+        if _public_access(container) != _public_access(before[name]):
+            operations.append((_set_container_public_access, container))
+        if (container.Metadata or {}) != (before[name].Metadata or {}):
+            operations.append((_set_container_metadata, container))
+
+    for name, container in before.items():
+        if name not in after:
+            operations.append((_delete_container, container))
+
+    return operations
+
+
+def _account_patch(previous: ResourceModel, model: ResourceModel) -> Dict[str, Any]:
+    """Storage account properties to PATCH, empty when nothing changed."""
+    patch: Dict[str, Any] = {}
+    properties = {}
+
+    # Standard and Premium accounts are different hardware: no conversion in place
+    if model.AzureStorageSku != previous.AzureStorageSku:
+        if _is_premium(model.AzureStorageSku) != _is_premium(previous.AzureStorageSku):
+            raise exceptions.NotUpdatable(f"AzureStorageSku cannot change from {previous.AzureStorageSku} to {model.AzureStorageSku} in place")
+        patch['sku'] = {'name': model.AzureStorageSku}
+
+    if model.AzureStorageAccessTier and model.AzureStorageAccessTier != previous.AzureStorageAccessTier:
+        properties['accessTier'] = model.AzureStorageAccessTier
+
+    # Public access must be allowed before a container is made public
+    public_before = any(_public_access(container) for container in _containers(previous))
+    public_after = any(_public_access(container) for container in _containers(model))
+    if public_after != public_before:
+        properties['allowBlobPublicAccess'] = public_after
+
+    if properties:
+        patch['properties'] = properties
+
+    return patch
+
+
+def _delete_containers_delete(model: ResourceModel, context: MutableMapping[str, Any]) -> Optional[ProgressEvent]:
+
+    # Fails with NotFound when the account is gone; the blob endpoint of a
+    # deleted account does not even resolve
+    get_azure_storage_account(model, use_cache=False)
+
+    storage_token = get_azure_token_for_storage_account(model)
+    concurrency.gather(
+        *[functools.partial(_delete_container, model, container, storage_token) for container in _containers(model)],
+        max_workers=CONTAINER_CONCURRENCY,
+    )
+
+    state_machine.transition(context, state_machine.DELETE_ACCOUNT_DELETE)
+    return None
+
+
+def _delete_account_delete(model: ResourceModel, context: MutableMapping[str, Any]) -> Optional[ProgressEvent]:
+
+    response = delete_azure_storage_account(model)
+
+    if response.status_code == 202:
+
+        # Poll the operation status URL on the next invocation
+        state_machine.transition(context, state_machine.DELETE_ACCOUNT_POLL, operation_url=response.headers['Location'])
+        return _progress_event_callback(
+            model=model,
+            callback_context=context,
+            callback_delay_seconds=_poll_delay(context, response),
+        )
+
+    # Confirm the deletion is visible before reporting success
+    state_machine.transition(context, state_machine.DELETE_ACCOUNT_POLL)
+    return None
+
+
+def _delete_account_poll(model: ResourceModel, context: MutableMapping[str, Any]) -> Optional[ProgressEvent]:
+
+    if context.get("operationUrl"):
+        token = get_azure_token(model)
+        headers = {'Authorization': 'Bearer ' + token['accessToken']}
+
+        response = http_client.request('GET', context["operationUrl"], headers=headers)
+
+        if response.status_code == 202:
+            LOG.info(f"Storage account not yet deleted")
+            return _progress_event_callback(
+                model=model,
+                callback_context=context,
+                callback_delay_seconds=_poll_delay(context, response),
+            )
+        elif response.status_code not in (200, 204):
+            raise Exception(f"ERROR: {response.status_code} - {response.content}")
     else:
+        try:
+            get_azure_storage_account(model, use_cache=False)
+        except ResourceNotFoundException:
+            pass
+        else:
+            LOG.info(f"Storage account not yet deleted")
+            return _progress_event_callback(
+                model=model,
+                callback_context=context,
+                callback_delay_seconds=_poll_delay(context),
+            )
+
+    LOG.info(f"Storage account {model.AzureBlobStorageAccountName} deleted")
+    state_machine.transition(context, state_machine.DELETE_RG_CLEANUP if DELETE_EMPTY_RESOURCE_GROUPS else state_machine.DONE)
+    return None
+
+
+def _delete_rg_cleanup(model: ResourceModel, context: MutableMapping[str, Any]) -> Optional[ProgressEvent]:
+
+    headers = _management_headers(model)
+    url = _resource_group_url(model)
+
+    # The group and its resources are read at once, in one ARM batch; one
+    # remaining resource is enough to keep the group
+    group, resources = arm_batch.send([
+        arm_batch.ArmRequest('GET', url + '?api-version=2022-01-01'),
+        arm_batch.ArmRequest('GET', url + '/resources?$top=1&api-version=2021-04-01'),
+    ], headers)
+
+    if group.status_code == 200 and (group.json().get('tags') or {}).get(RESOURCE_GROUP_OWNER_TAG) == TYPE_NAME:
+        if resources.status_code == 200 and not resources.json().get('value'):
+
+            # Best effort: the deletion runs on in Azure, and a CREATE racing
+            # it waits for it to finish, then creates the group again.  A
+            # CREATE whose account PUT lands between the check above and
+            # this request loses its account, see DELETE_EMPTY_RESOURCE_GROUPS
+            LOG.info(f"Deleting empty resource group {model.AzureResourceGroup}")
+            resource_group_cache.forget(model.AzureSubscriptionId, model.AzureResourceGroup)
+            response = http_client.request('DELETE', url + '?api-version=2022-01-01', headers=headers)
+            if response.status_code not in (200, 202, 404):
+                LOG.warning(f"Could not delete resource group {model.AzureResourceGroup}: {response.status_code} - {response.content}")
+
+    state_machine.transition(context, state_machine.DONE)
+    return None
+
+
+CREATE_STEPS = {
+    state_machine.CREATE_RG_ENSURE: _create_rg_ensure,
+    state_machine.CREATE_ACCOUNT_PUT: _create_account_put,
+    state_machine.CREATE_ACCOUNT_POLL: _create_account_poll,
+    state_machine.CREATE_CONTAINER_PUT: _create_container_put,
+    state_machine.CREATE_PROBE: _create_probe,
+    state_machine.CREATE_SEED: _create_seed,
+    state_machine.CREATE_SAS: _create_sas,
+}
+
+DELETE_STEPS = {
+    state_machine.DELETE_CONTAINERS_DELETE: _delete_containers_delete,
+    state_machine.DELETE_ACCOUNT_DELETE: _delete_account_delete,
+    state_machine.DELETE_ACCOUNT_POLL: _delete_account_poll,
+    state_machine.DELETE_RG_CLEANUP: _delete_rg_cleanup,
+}
+
+
+def _run_state(model: ResourceModel, context: MutableMapping[str, Any], steps: Mapping[str, Any]) -> Optional[ProgressEvent]:
+    """Run the current state of a pipeline, backing off when Azure throttles it."""
+    state = state_machine.current_state(context)
+
+    try:
+        with metrics.timed(state):
+            return steps[state](model, context)
+    except AzureThrottlingException as te:
+
+        # Retry the same state on a later callback, instead of failing the whole pipeline
+        LOG.warning(f"Azure throttled state {state}: {te}")
         return _progress_event_callback(
             model=model,
+            callback_context=context,
+            callback_delay_seconds=max(int(te.retry_after or 0), _poll_delay(context)),
         )
+
+
+def _redacted(model: Optional[ResourceModel]) -> Any:
+    """Return the model as a dictionary that is safe to log."""
+    if not model:
+        return model
+
+    values = model._serialize()
+    if values.get("AzureClientSecret"):
+        values["AzureClientSecret"] = "****"
+    if values.get("AzureBlobContainerSasUrl"):
+        values["AzureBlobContainerSasUrl"] = values["AzureBlobContainerSasUrl"].split('?')[0] + "?****"
+
+    return values
+
+
+def _poll_delay(context: MutableMapping[str, Any], response: Any = None, estimate_key: Any = None) -> int:
+    """Return the delay before the next poll, honouring Azure's Retry-After."""
+    attempt = context.get("pollAttempt", 0)
+    context["pollAttempt"] = attempt + 1
+
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    return polling.next_poll_delay(attempt, retry_after, estimate_key)
+
+
+def _containers(model: ResourceModel) -> Sequence[Container]:
+    """Containers to create in the storage account, in template order."""
+    if model.Containers:
+        return model.Containers
+
+    return [Container(Name=CONTAINER_NAME, PublicAccess=None, Metadata=None)]
+
+
+def _provisioning_state(account: Optional[Mapping[str, Any]]) -> Optional[str]:
+    return ((account or {}).get('properties') or {}).get('provisioningState')
+
+
+def _blob_error_code(response: Any) -> Optional[str]:
+    """Error code of a blob service response, e.g. ContainerAlreadyExists."""
+    error_code = response.headers.get('x-ms-error-code')
+    if error_code:
+        return error_code
+
+    for code in ('ContainerAlreadyExists', 'ContainerBeingDeleted'):
+        if code in response.text:
+            return code
+
+    return None
+
+
+def _readiness(model: ResourceModel) -> Optional[str]:
+    """Return why the resource is not ready yet, or None once it is.
+
+    Raises ResourceNotFoundException when the account or one of its
+    containers does not exist.
+    """
+    account = get_azure_storage_account(model, use_cache=False)
+
+    provisioning_state = _provisioning_state(account)
+    if provisioning_state in FAILED_PROVISIONING_STATES:
+        raise Exception(f"ERROR: Storage account {model.AzureBlobStorageAccountName} provisioning {provisioning_state}")
+    if provisioning_state and provisioning_state != 'Succeeded':
+        return f"storage account {provisioning_state}"
+
+    # The containers are checked once the account is ready, in parallel
+    storage_token = get_azure_token_for_storage_account(model)
+    urls = model.AzureBlobContainerUrls or [model.AzureBlobContainerUrl]
+    concurrency.gather(
+        *[functools.partial(get_azure_blob_container, url, storage_token) for url in urls if url],
+        max_workers=CONTAINER_CONCURRENCY,
+    )
+
+    return None
+
+
+def _container_url(model: ResourceModel, container_name: str) -> str:
+    return f"{endpoints.blob_endpoint(model.AzureBlobStorageAccountName)}/{container_name}"
+
+
+def _public_access(container: Container) -> Optional[str]:
+    """Value of the x-ms-blob-public-access header, None for private containers."""
+    if container.PublicAccess in ('Blob', 'Container'):
+        return container.PublicAccess.lower()
+
+    return None
+
+
+def _listed_model(model: ResourceModel, account: Mapping[str, Any]) -> ResourceModel:
+    """Map a storage account listed by ARM to a model, without credentials."""
+    name = account['name']
+    container_name = (account.get('tags') or {}).get(PRIMARY_CONTAINER_TAG, CONTAINER_NAME)
+
+    values = {
+        'AzureSubscriptionId': model.AzureSubscriptionId,
+        'AzureTenantId': model.AzureTenantId,
+        'AzureClientId': model.AzureClientId,
+        'AzureResourceGroup': model.AzureResourceGroup or RESOURCE_GROUP_NAME,
+        'AzureLocation': account.get('location'),
+        'AzureStorageSku': (account.get('sku') or {}).get('name'),
+        'AzureStorageKind': account.get('kind'),
+        'AzureStorageAccessTier': (account.get('properties') or {}).get('accessTier'),
+        'AzureBlobStorageAccountName': name,
+        'AzureBlobContainerUrl': f"{endpoints.blob_endpoint(name)}/{container_name}",
+    }
+
+    # Premium accounts have no access tier, and ARM may leave out any of
+    # these; the generated model cannot deserialize None
+    return ResourceModel._deserialize({key: value for key, value in values.items() if value is not None})
+
+
+def _resource_group_url(model: ResourceModel) -> str:
+    return f"{endpoints.management_url()}/subscriptions/{model.AzureSubscriptionId}/resourceGroups/{model.AzureResourceGroup}"
+
+
+def _management_headers(model: ResourceModel) -> Dict[str, str]:
+    token = get_azure_token(model)
+    return {'Authorization': 'Bearer ' + token['accessToken']}
+
+
+def _storage_account_id(model: ResourceModel) -> str:
+    return f"/subscriptions/{model.AzureSubscriptionId}/resourceGroups/{model.AzureResourceGroup}/providers/Microsoft.Storage/storageAccounts/{model.AzureBlobStorageAccountName}"
+
+
+def _storage_accounts_url(model: ResourceModel) -> str:
+    url = '{managementUrl}/subscriptions/{subscriptionId}/resourceGroups/{resourceGroupName}/providers/Microsoft.Storage/storageAccounts'
+    return url.format(managementUrl=endpoints.management_url(), subscriptionId=model.AzureSubscriptionId, resourceGroupName=model.AzureResourceGroup or RESOURCE_GROUP_NAME)
+
+
+def _encode_next_token(link: str, skip: int) -> str:
+    payload = json.dumps({'link': link, 'skip': skip}).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def _decode_next_token(model: ResourceModel, next_token: Optional[str]):
+    """Return the ARM page to read and the number of its accounts already listed."""
+    if not next_token:
+        return _storage_accounts_url(model) + '?api-version=2021-08-01', 0
+
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(next_token.encode()))
+        link, skip = payload['link'], int(payload['skip'])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid nextToken")
+
+    # The token comes back from the caller: never send the management token
+    # anywhere but to the storage accounts of the model's subscription
+    if not link.lower().startswith(_storage_accounts_url(model).lower() + '?'):
+        raise ValueError("Invalid nextToken")
+
+    return link, skip
+
+
+def _provisioning_key(model: ResourceModel):
+    """Storage accounts with the same region, SKU and kind take about as long to provision."""
+    return (model.AzureLocation, model.AzureStorageSku, model.AzureStorageKind)
+
+
+def _apply_defaults(model: ResourceModel) -> None:
+    """Fill in the account settings the template left out."""
+    model.AzureResourceGroup = model.AzureResourceGroup or RESOURCE_GROUP_NAME
+    model.AzureLocation = model.AzureLocation or LOCATION
+    model.AzureStorageSku = model.AzureStorageSku or SKU
+    model.AzureStorageKind = model.AzureStorageKind or KIND
+
+
+def _apply_account_settings(model: ResourceModel, account: Mapping[str, Any]) -> None:
+    """Set the account settings of the model from the account ARM describes."""
+    model.AzureLocation = account.get('location', model.AzureLocation)
+    model.AzureStorageSku = (account.get('sku') or {}).get('name', model.AzureStorageSku)
+    model.AzureStorageKind = account.get('kind', model.AzureStorageKind)
+    model.AzureStorageAccessTier = (account.get('properties') or {}).get('accessTier', model.AzureStorageAccessTier)
+
+
+def _is_premium(sku: Optional[str]) -> bool:
+    return bool(sku) and sku.startswith('Premium_')
+
+
+def _validate_account_settings(model: ResourceModel) -> None:
+    """Reject combinations Azure would only refuse after a whole create cycle."""
+    if model.AzureStorageKind in PREMIUM_ONLY_KINDS and not _is_premium(model.AzureStorageSku):
+        raise exceptions.InvalidRequest(f"{model.AzureStorageKind} accounts require a Premium AzureStorageSku, not {model.AzureStorageSku}")
+
+    if model.AzureStorageAccessTier and (_is_premium(model.AzureStorageSku) or model.AzureStorageKind in PREMIUM_ONLY_KINDS):
+        raise exceptions.InvalidRequest("AzureStorageAccessTier is only supported by Standard accounts")
+
+    if model.Seed and model.Seed.Container and model.Seed.Container not in [c.Name for c in _containers(model)]:
+        raise exceptions.InvalidRequest(f"Seed Container {model.Seed.Container} is not one of the Containers")
+
+    signature = model.SharedAccessSignature
+    if signature and (signature.Type or SAS_TYPE) == 'UserDelegation' and (signature.ExpiryHours or SAS_EXPIRY_HOURS) > USER_DELEGATION_MAX_HOURS:
+        raise exceptions.InvalidRequest(f"UserDelegation shared access signatures are valid for {USER_DELEGATION_MAX_HOURS} hours at most")
+
+    settings = model.Probe
+    probe_kb = (settings.BlobSizeKB or PROBE_BLOB_SIZE_KB) * (settings.BlobCount or PROBE_BLOB_COUNT) if settings else 0
+    if probe_kb > PROBE_MAX_TOTAL_MB * 1024:
+        raise exceptions.InvalidRequest(f"Probe BlobSizeKB * BlobCount is {probe_kb} KiB, the probe transfers {PROBE_MAX_TOTAL_MB} MiB at most")
+
     
 # Azure Helper Methods
-def get_azure_storage_account(model: ResourceModel):
-    
-    # Get a new token
-    token = get_azure_token(model)
+def get_azure_storage_account(model: ResourceModel, use_cache: bool = True):
+    """Return the storage account, as ARM describes it.
 
-    if token:
+    Reads within AZURE_READ_CACHE_TTL_SECONDS of the previous one are served
+    from the read cache, unless use_cache is False (e.g. to watch a deletion).
+    """
+    resource_id = _storage_account_id(model)
+
+    def fetch(etag):
+
+        # Get a new token
+        token = get_azure_token(model)
 
         headers = {'Authorization': 'Bearer ' + token['accessToken']}
-        url = f"https://management.azure.com/subscriptions/{model.AzureSubscriptionId}/resourceGroups/{model.AzureResourceGroup}/providers/Microsoft.Storage/storageAccounts/{model.AzureBlobStorageAccountName}?api-version=2021-04-01"
+        if etag:
+            headers['If-None-Match'] = etag
+        url = f"{endpoints.management_url()}{resource_id}?api-version=2021-04-01"
 
-        response = requests.get(url, headers=headers, timeout=90)
+        response = http_client.request('GET', url, headers=headers)
 
-        # Check the response code for Not Found
         if response.status_code == 200:
-            LOG.info(f"Storage Account {model.AzureBlobStorageAccountName} exists!")
-        elif response.status_code == 404:
-            LOG.warning(f"Storage account {model.AzureBlobStorageAccountName} DOES NOT exist")
-            raise ResourceNotFoundException(f"Storage account {model.AzureBlobStorageAccountName} DOES NOT exist")    
-        else:
-            raise Exception(f"ERROR: {response.status_code} - {response.content}")      
-        
-        return response
+            return response.status_code, response.json(), response.headers.get('ETag')
+        return response.status_code, response.content, None
+
+    if use_cache:
+        status_code, body = read_cache.get_cached(resource_id, fetch)
+    else:
+        read_cache.invalidate(resource_id)
+        status_code, body, _ = fetch(None)
+
+    # Check the response code for Not Found
+    if status_code == 200:
+        LOG.info(f"Storage Account {model.AzureBlobStorageAccountName} exists!")
+    elif status_code == 404:
+        LOG.warning(f"Storage account {model.AzureBlobStorageAccountName} DOES NOT exist")
+        raise ResourceNotFoundException(f"Storage account {model.AzureBlobStorageAccountName} DOES NOT exist")    
+    else:
+        raise Exception(f"ERROR: {status_code} - {body}")      
+
+    return body
     
     
+def check_azure_storage_account_name(model: ResourceModel, name: str):
+    """Return whether the storage account name is available, and why not."""
+
+    request = _name_availability_request(model, name)
+    response = http_client.request(request.method, request.url, headers=_management_headers(model), json=request.json)
+
+    return _name_availability(response)
+
+
+def _name_availability_request(model: ResourceModel, name: str) -> arm_batch.ArmRequest:
+
+    url = f"{endpoints.management_url()}/subscriptions/{model.AzureSubscriptionId}/providers/Microsoft.Storage/checkNameAvailability?api-version=2021-08-01"
+    return arm_batch.ArmRequest('POST', url, {'name': name, 'type': 'Microsoft.Storage/storageAccounts'})
+
+
+def _name_availability(response: Any):
+
+    if response.status_code != 200:
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
+
+    result = response.json()
+    return bool(result.get('nameAvailable')), result.get('reason')
+
+
+def get_azure_blob_container(url: str, storage_token: str):
+    """HEAD the container, only its properties come back."""
+
+    response = http_client.request('HEAD', url + '?restype=container', headers=azure_storage_request_header(storage_token))
+
+    if response.status_code == 404:
+        LOG.warning(f"Blob container {url} DOES NOT exist")
+        raise ResourceNotFoundException(f"Blob container {url} DOES NOT exist")
+    elif response.status_code != 200:
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
+
+    return response.headers
+
+
+def list_azure_storage_accounts(model: ResourceModel, link: str):
+
+    token = get_azure_token(model)
+    headers = {'Authorization': 'Bearer ' + token['accessToken']}
+
+    response = http_client.request('GET', link, headers=headers)
+
+    if response.status_code != 200:
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
+
+    return response.json()
+
+
+def update_azure_storage_account(model: ResourceModel, patch: Mapping[str, Any]):
+
+    token = get_azure_token(model)
+    headers = {'Authorization': 'Bearer ' + token['accessToken']}
+    url = f"{endpoints.management_url()}{_storage_account_id(model)}?api-version=2021-08-01"
+
+    response = http_client.request('PATCH', url, headers=headers, json=patch)
+    read_cache.invalidate(_storage_account_id(model))
+
+    if response.status_code == 404:
+        raise ResourceNotFoundException(f"Storage account {model.AzureBlobStorageAccountName} DOES NOT exist")
+    elif response.status_code != 200:
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
+
+    return response.json()
+
+
+def get_azure_storage_account_key(model: ResourceModel):
+    """Return the first access key of the storage account."""
+
+    token = get_azure_token(model)
+    headers = {'Authorization': 'Bearer ' + token['accessToken']}
+    url = f"{endpoints.management_url()}{_storage_account_id(model)}/listKeys?api-version=2021-08-01"
+
+    response = http_client.request('POST', url, headers=headers)
+
+    if response.status_code == 404:
+        raise ResourceNotFoundException(f"Storage account {model.AzureBlobStorageAccountName} DOES NOT exist")
+    elif response.status_code != 200:
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
+
+    return response.json()['keys'][0]['value']
+
+
+def get_azure_user_delegation_key(model: ResourceModel, start: datetime.datetime, expiry: datetime.datetime):
+    """Return a user delegation key of the service principal, valid from start to expiry."""
+
+    storage_token = get_azure_token_for_storage_account(model)
+    url = f"{endpoints.blob_endpoint(model.AzureBlobStorageAccountName)}/?restype=service&comp=userdelegationkey"
+
+    response = http_client.request('POST', url, headers=azure_storage_request_header(storage_token), data=sas.user_delegation_key_request(start, expiry))
+
+    if response.status_code != 200:
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
+
+    return sas.parse_user_delegation_key(response.content)
+
+
 def delete_azure_storage_account(model: ResourceModel):
 
     # Get a new token
@@ -484,12 +1889,13 @@ def delete_azure_storage_account(model: ResourceModel):
     if token:
 
         headers = {'Authorization': 'Bearer ' + token['accessToken']}
-        url = f"https://management.azure.com/subscriptions/{model.AzureSubscriptionId}/resourceGroups/{model.AzureResourceGroup}/providers/Microsoft.Storage/storageAccounts/{model.AzureBlobStorageAccountName}?api-version=2022-09-01"
+        url = f"{endpoints.management_url()}/subscriptions/{model.AzureSubscriptionId}/resourceGroups/{model.AzureResourceGroup}/providers/Microsoft.Storage/storageAccounts/{model.AzureBlobStorageAccountName}?api-version=2022-09-01"
 
-        response = requests.delete(url, headers=headers, timeout=90)
+        response = http_client.request('DELETE', url, headers=headers)
+        read_cache.invalidate(_storage_account_id(model))
 
         # Check the response code for Not Found
-        if response.status_code == 200:
+        if response.status_code in (200, 202):
             LOG.info(f"Storage Account DELETE requested either Accepted or Completed!")
         elif response.status_code == 204:
             LOG.warning(f"Storage account {model.AzureBlobStorageAccountName} DOES NOT exist")
@@ -502,32 +1908,63 @@ def delete_azure_storage_account(model: ResourceModel):
 
 def get_azure_token(model: ResourceModel):
 
-    # Authentication with Azure AD
-    AUTHORITY_HOST_URL = 'https://login.microsoftonline.com'
-    AUTHORITY_URL = AUTHORITY_HOST_URL + '/' + model.AzureTenantId
+    # Authentication with Azure AD, using the same client credentials request as
+    # the storage token (adal and its dependencies are too slow to import on cold starts)
     RESOURCE_URL = 'https://management.azure.com'
-    context = adal.AuthenticationContext(AUTHORITY_URL)
 
-    token = context.acquire_token_with_client_credentials(RESOURCE_URL, model.AzureClientId, model.AzureClientSecret)
+    def fetch_token():
+        token = request_azure_token(model, RESOURCE_URL)
+        return {'accessToken': token['access_token'], 'expiresIn': token.get('expires_in'), 'expires_on': token.get('expires_on')}
+
+    # Reuse the token across handlers and warm invocations until it is close
+    # to expiry, for callers presenting the credential it was obtained with
+    credential = credentials.fingerprint(model)
+    with metrics.timed("Token", Resource=RESOURCE_URL):
+        token = get_cached_token(model.AzureTenantId, model.AzureClientId, RESOURCE_URL, credential, fetch_token)
     return token
 
 
 def get_azure_token_for_storage_account(model: ResourceModel, 
                                         resource_url = 'https://storage.azure.com/'):
-    
-    # Construct the access token request
-    token_url = f'https://login.microsoftonline.com/{model.AzureTenantId}/oauth2/token'
+
+    def fetch_token():
+        return request_azure_token(model, resource_url)
+
+    # Reuse the token across handlers and warm invocations until it is close
+    # to expiry, for callers presenting the credential it was obtained with
+    credential = credentials.fingerprint(model)
+    with metrics.timed("Token", Resource=resource_url):
+        token = get_cached_token(model.AzureTenantId, model.AzureClientId, resource_url, credential, fetch_token)
+    return token['access_token']
+
+
+def request_azure_token(model: ResourceModel, resource_url: str, retry_rejected: bool = True):
+
+    # Construct the access token request; the client proves its identity
+    # with the credential of the first provider the model configures
+    token_url = f'{endpoints.authority_host_url()}/{model.AzureTenantId}/oauth2/token'
     token_request_data = {
         'grant_type': 'client_credentials',
         'client_id': model.AzureClientId,
-        'client_secret': model.AzureClientSecret,
-        'resource': resource_url
+        'resource': resource_url,
+        **credentials.token_request_fields(model),
     }
 
-    response = requests.post(token_url, data=token_request_data, timeout=90)
+    response = http_client.request('POST', token_url, data=token_request_data)
 
     response_json = response.json()
-    return response_json['access_token']
+    if 'access_token' not in response_json:
+
+        # A credential cached from Secrets Manager may have been rotated: resolve it again, once
+        rotatable = model.AzureClientCertificateSecretId or model.AzureClientSecretId
+        if retry_rejected and rotatable and response_json.get('error') == 'invalid_client':
+            LOG.info("Azure AD rejected the cached client credential, resolving it again")
+            credentials.invalidate(model)
+            return request_azure_token(model, resource_url, retry_rejected=False)
+
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
+
+    return response_json
 
 def azure_storage_request_header(token: str):
 
@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+import time
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Tuple,
+)
+from urllib.parse import urlsplit
+
+from . import concurrency, metrics, retry, token_cache
+
+# requests is only imported when the first session is opened, to keep it
+# out of the Lambda cold start import time.
+if TYPE_CHECKING:
+    import requests  #type: ignore
+
+# Use this logger to forward log messages to CloudWatch Logs.
+LOG = logging.getLogger(__name__)
+
+# Connection pool settings; they can be tuned through the Lambda environment.
+HTTP_POOL_SIZE = int(os.environ.get("AZURE_HTTP_POOL_SIZE", "10"))
+HTTP_MAX_RETRIES = int(os.environ.get("AZURE_HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.environ.get("AZURE_HTTP_BACKOFF_FACTOR", "0.5"))
+HTTP_TIMEOUT_SECONDS = 90
+
+# Requests that can safely share a response with an identical concurrent one.
+IDEMPOTENT_READ_METHODS = ("GET", "HEAD")
+
+# 401s of the blob service about the copy source of Put Block From URL,
+# rather than about the token sent to it.
+COPY_SOURCE_ERROR_CODES = ("CannotVerifyCopySource",)
+
+# One pooled, keep-alive session per scheme and host (management.azure.com,
+# login.microsoftonline.com, each {account}.blob.core.windows.net).  They live
+# at module level so warm Lambda invocations reuse the open TLS connections.
+_SESSIONS: Dict[str, "requests.Session"] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def get_session(url: str) -> "requests.Session":
+    """Return the pooled session for the host of the given URL."""
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(origin)
+        if session is None:
+            LOG.debug(f"Opening pooled HTTP session for {origin}")
+            session = _new_session()
+            _SESSIONS[origin] = session
+
+    return session
+
+
+def request(method: str, url: str, **kwargs: Any) -> "requests.Response":
+    """Send a request to Azure through the pooled session for its host.
+
+    A cached token Azure rejects with a 401, e.g. once its credential was
+    revoked or rotated, is fetched again and the request sent once more.
+    """
+    kwargs.setdefault("timeout", HTTP_TIMEOUT_SECONDS)
+
+    response = _send(method, url, kwargs)
+
+    authorization = (kwargs.get("headers") or {}).get("Authorization", "")
+    if response.status_code == 401 and authorization.startswith("Bearer ") and response.headers.get("x-ms-error-code") not in COPY_SOURCE_ERROR_CODES:
+        fresh_token = token_cache.refresh_rejected_token(authorization[len("Bearer "):])
+        if fresh_token:
+            response.close()
+            response = _send(method, url, {**kwargs, "headers": {**kwargs["headers"], "Authorization": f"Bearer {fresh_token}"}})
+
+    return response
+
+
+def _send(method: str, url: str, kwargs: Dict[str, Any]) -> "requests.Response":
+
+    session = get_session(url)
+
+    def send() -> "requests.Response":
+        started = time.perf_counter()
+        status_code = None
+        retries = 0
+        try:
+            response = session.request(method, url, **kwargs)
+            status_code = response.status_code
+            retries = _retry_count(response)
+            return response
+        finally:
+            metrics.record_http_call(method, url, status_code, retries, started)
+
+    # Throttled and transient responses are retried by the retry engine,
+    # that shares a request budget across callers.  Streamed bodies can only
+    # be read once, so they are never shared.
+    if method.upper() not in IDEMPOTENT_READ_METHODS or kwargs.get("stream"):
+        return retry.send_with_retries(url, send)
+
+    # Reads in flight in the same handler invocation share one response when
+    # every header (If-None-Match, Range, x-ms-version...) and parameter matches
+    return concurrency.single_flight(_read_key(method, url, kwargs), lambda: retry.send_with_retries(url, send))
+
+
+def _read_key(method: str, url: str, kwargs: Dict[str, Any]) -> Tuple[Any, ...]:
+    headers = sorted((name.lower(), value) for name, value in (kwargs.get("headers") or {}).items())
+    params = sorted((kwargs.get("params") or {}).items())
+    return (method.upper(), url, tuple(headers), tuple(params))
+
+
+def _retry_count(response: "requests.Response") -> int:
+    # urllib3 keeps the retries done by the adapter on the raw response
+    history = getattr(getattr(response.raw, "retries", None), "history", None)
+    return len(history or ())
+
+
+def _new_session() -> "requests.Session":
+    import requests  #type: ignore
+    from requests.adapters import HTTPAdapter  #type: ignore
+    from urllib3.util.retry import Retry  #type: ignore
+
+    # The adapter only retries connection and read errors; responses are
+    # retried by the retry engine.
+    connection_retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=HTTP_MAX_RETRIES,
+        status=0,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        allowed_methods=False,
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=connection_retry,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+
+    return session
@@ -0,0 +1,156 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    Mapping,
+    Optional,
+)
+from urllib.parse import urlsplit
+
+# Use this logger to forward log messages to CloudWatch Logs.
+LOG = logging.getLogger(__name__)
+
+# Metrics are written as CloudWatch Embedded Metric Format (EMF) records
+# to stdout, that Lambda forwards to CloudWatch Logs where they are turned
+# into metrics.  METRICS_SINK selects where records go:
+#   emf  - EMF records on stdout (default)
+#   json - JSON lines appended to the file named by METRICS_JSON_PATH
+#   none - metrics are not recorded
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "POC/Azure/BlobStorage")
+DEFAULT_METRICS_JSON_PATH = "metrics.jsonl"
+
+# The handler action (CREATE, READ, ...) the current code runs for.
+_operation: ContextVar[str] = ContextVar("operation", default="")
+_sink_lock = threading.Lock()
+
+
+def instrument_handler(action: str) -> Callable:
+    """Decorate a handler to time it and tag the metrics it records."""
+
+    def decorator(handler: Callable) -> Callable:
+
+        @functools.wraps(handler)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            token = _operation.set(action)
+            try:
+                with timed("Handler") as properties:
+                    progress = handler(*args, **kwargs)
+                    properties["Status"] = str(getattr(progress, "status", ""))
+                    properties["ErrorCode"] = str(getattr(progress, "errorCode", "") or "")
+                return progress
+            finally:
+                _operation.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def timed(phase: str, **properties: Any) -> Iterator[Dict[str, Any]]:
+    """Time the enclosed block and record it as the latency of phase.
+
+    The yielded dictionary can be filled with properties to add to the record.
+    """
+    started = time.perf_counter()
+    try:
+        yield properties
+    finally:
+        emit(
+            dimensions={"Operation": _operation.get(), "Phase": phase},
+            values={"Latency": _elapsed_ms(started)},
+            properties=properties,
+        )
+
+
+def record_http_call(
+    method: str,
+    url: str,
+    status_code: Optional[int],
+    retries: int,
+    started: float,
+) -> None:
+    """Record an outbound Azure call made by the HTTP client."""
+    parts = urlsplit(url)
+    emit(
+        dimensions={"Operation": _operation.get(), "Service": azure_service(url)},
+        values={"Latency": _elapsed_ms(started), "Retries": retries},
+        properties={
+            "Host": parts.netloc,
+            "Method": method,
+            "StatusCode": status_code,
+        },
+    )
+
+
+def record_arm_batch(requests: int, resent: int) -> None:
+    """Record an ARM batch, and how many of its requests were sent again on their own."""
+    emit(
+        dimensions={"Operation": _operation.get(), "Service": "arm"},
+        values={"BatchedRequests": requests, "ResentRequests": resent},
+    )
+
+
+def azure_service(url: str) -> str:
+    """Name of the Azure service a URL belongs to: aad, arm or blob."""
+    parts = urlsplit(url)
+    path = parts.path.lower()
+
+    if "/oauth2/" in path:
+        return "aad"
+    if parts.netloc.startswith("management.") or path.startswith(("/subscriptions/", "/providers/", "/batch")):
+        return "arm"
+    return "blob"
+
+
+def emit(
+    dimensions: Mapping[str, str],
+    values: Mapping[str, float],
+    properties: Optional[Mapping[str, Any]] = None,
+) -> None:
+    sink = os.environ.get("METRICS_SINK", "emf").lower()
+    if sink == "none":
+        return
+
+    record: Dict[str, Any] = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [
+                    {"Name": name, "Unit": "Milliseconds" if name == "Latency" else "Count"}
+                    for name in values
+                ],
+            }],
+        },
+        **(properties or {}),
+        **dimensions,
+        **values,
+    }
+    line = json.dumps(record, default=str)
+
+    try:
+        with _sink_lock:
+            if sink == "json":
+                with open(os.environ.get("METRICS_JSON_PATH", DEFAULT_METRICS_JSON_PATH), "a") as f:
+                    f.write(line + "\n")
+            else:
+                print(line, flush=True)
+    except OSError as e:
+        # Metrics must never fail a handler.
+        LOG.warning(f"Could not write metrics: {e}")
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
@@ -45,9 +45,29 @@ class ResourceModel(BaseModel):
     AzureClientId: Optional[str]
     AzureTenantId: Optional[str]
     AzureClientSecret: Optional[str]
+    AzureClientSecretId: Optional[str]
+    AzureClientCertificateSecretId: Optional[str]
     AzureResourceGroup: Optional[str]
+    AzureLocation: Optional[str]
+    AzureStorageSku: Optional[str]
+    AzureStorageKind: Optional[str]
+    AzureStorageAccessTier: Optional[str]
     AzureBlobStorageAccountName: Optional[str]
     AzureBlobContainerUrl: Optional[str]
+    Containers: Optional[Sequence["_Container"]]
+    Seed: Optional["_Seed"]
+    SharedAccessSignature: Optional["_SharedAccessSignature"]
+    Probe: Optional["_Probe"]
+    AzureProbeEndpointReadySeconds: Optional[float]
+    AzureProbeUploadMBps: Optional[float]
+    AzureProbeDownloadMBps: Optional[float]
+    AzureProbeUploadLatencyP50Ms: Optional[float]
+    AzureProbeUploadLatencyP99Ms: Optional[float]
+    AzureProbeDownloadLatencyP50Ms: Optional[float]
+    AzureProbeDownloadLatencyP99Ms: Optional[float]
+    AzureBlobContainerSasUrl: Optional[str]
+    AzureBlobContainerSasExpiry: Optional[str]
+    AzureBlobContainerUrls: Optional[Sequence[str]]
 
     @classmethod
     def _deserialize(
@@ -63,9 +83,29 @@ class ResourceModel(BaseModel):
             AzureClientId=json_data.get("AzureClientId"),
             AzureTenantId=json_data.get("AzureTenantId"),
             AzureClientSecret=json_data.get("AzureClientSecret"),
+            AzureClientSecretId=json_data.get("AzureClientSecretId"),
+            AzureClientCertificateSecretId=json_data.get("AzureClientCertificateSecretId"),
             AzureResourceGroup=json_data.get("AzureResourceGroup"),
+            AzureLocation=json_data.get("AzureLocation"),
+            AzureStorageSku=json_data.get("AzureStorageSku"),
+            AzureStorageKind=json_data.get("AzureStorageKind"),
+            AzureStorageAccessTier=json_data.get("AzureStorageAccessTier"),
             AzureBlobStorageAccountName=json_data.get("AzureBlobStorageAccountName"),
             AzureBlobContainerUrl=json_data.get("AzureBlobContainerUrl"),
+            Containers=deserialize_list(json_data.get("Containers"), Container),
+            Seed=Seed._deserialize(json_data.get("Seed")),
+            SharedAccessSignature=SharedAccessSignature._deserialize(json_data.get("SharedAccessSignature")),
+            Probe=Probe._deserialize(json_data.get("Probe")),
+            AzureProbeEndpointReadySeconds=json_data.get("AzureProbeEndpointReadySeconds"),
+            AzureProbeUploadMBps=json_data.get("AzureProbeUploadMBps"),
+            AzureProbeDownloadMBps=json_data.get("AzureProbeDownloadMBps"),
+            AzureProbeUploadLatencyP50Ms=json_data.get("AzureProbeUploadLatencyP50Ms"),
+            AzureProbeUploadLatencyP99Ms=json_data.get("AzureProbeUploadLatencyP99Ms"),
+            AzureProbeDownloadLatencyP50Ms=json_data.get("AzureProbeDownloadLatencyP50Ms"),
+            AzureProbeDownloadLatencyP99Ms=json_data.get("AzureProbeDownloadLatencyP99Ms"),
+            AzureBlobContainerSasUrl=json_data.get("AzureBlobContainerSasUrl"),
+            AzureBlobContainerSasExpiry=json_data.get("AzureBlobContainerSasExpiry"),
+            AzureBlobContainerUrls=json_data.get("AzureBlobContainerUrls"),
         )
 
 
@@ -73,6 +113,102 @@ class ResourceModel(BaseModel):
 _ResourceModel = ResourceModel
 
 
+@dataclass
+class Container(BaseModel):
+    Name: Optional[str]
+    PublicAccess: Optional[str]
+    Metadata: Optional[MutableMapping[str, str]]
+
+    @classmethod
+    def _deserialize(
+        cls: Type["_Container"],
+        json_data: Optional[Mapping[str, Any]],
+    ) -> Optional["_Container"]:
+        if not json_data:
+            return None
+        return cls(
+            Name=json_data.get("Name"),
+            PublicAccess=json_data.get("PublicAccess"),
+            Metadata=json_data.get("Metadata"),
+        )
+
+
+# work around possible type aliasing issues when variable has same name as a model
+_Container = Container
+
+
+@dataclass
+class Seed(BaseModel):
+    S3Bucket: Optional[str]
+    S3Prefix: Optional[str]
+    Container: Optional[str]
+
+    @classmethod
+    def _deserialize(
+        cls: Type["_Seed"],
+        json_data: Optional[Mapping[str, Any]],
+    ) -> Optional["_Seed"]:
+        if not json_data:
+            return None
+        return cls(
+            S3Bucket=json_data.get("S3Bucket"),
+            S3Prefix=json_data.get("S3Prefix"),
+            Container=json_data.get("Container"),
+        )
+
+
+# work around possible type aliasing issues when variable has same name as a model
+_Seed = Seed
+
+
+@dataclass
+class SharedAccessSignature(BaseModel):
+    Type: Optional[str]
+    Permissions: Optional[str]
+    ExpiryHours: Optional[int]
+
+    @classmethod
+    def _deserialize(
+        cls: Type["_SharedAccessSignature"],
+        json_data: Optional[Mapping[str, Any]],
+    ) -> Optional["_SharedAccessSignature"]:
+        if not json_data:
+            return None
+        return cls(
+            Type=json_data.get("Type"),
+            Permissions=json_data.get("Permissions"),
+            ExpiryHours=json_data.get("ExpiryHours"),
+        )
+
+
+# work around possible type aliasing issues when variable has same name as a model
+_SharedAccessSignature = SharedAccessSignature
+
+
+@dataclass
+class Probe(BaseModel):
+    BlobSizeKB: Optional[int]
+    BlobCount: Optional[int]
+    Concurrency: Optional[int]
+
+    @classmethod
+    def _deserialize(
+        cls: Type["_Probe"],
+        json_data: Optional[Mapping[str, Any]],
+    ) -> Optional["_Probe"]:
+        if not json_data:
+            return None
+        return cls(
+            BlobSizeKB=json_data.get("BlobSizeKB"),
+            BlobCount=json_data.get("BlobCount"),
+            Concurrency=json_data.get("Concurrency"),
+        )
+
+
+# work around possible type aliasing issues when variable has same name as a model
+_Probe = Probe
+
+
 @dataclass
 class TypeConfigurationModel(BaseModel):
 
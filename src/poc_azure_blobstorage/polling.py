@@ -0,0 +1,83 @@
+import os
+import random
+import threading
+
+from typing import (
+    Dict,
+    Hashable,
+    Optional,
+)
+
+# Bounds of the exponential backoff used between polls of a long running
+# Azure operation, in seconds.  Retry-After returned by Azure always wins
+# over a shorter backoff.
+POLL_BASE_DELAY_SECONDS = float(os.environ.get("AZURE_POLL_BASE_DELAY_SECONDS", "2"))
+POLL_MAX_DELAY_SECONDS = float(os.environ.get("AZURE_POLL_MAX_DELAY_SECONDS", "60"))
+
+# Weight of the newest observation in the provisioning time estimates.
+ESTIMATE_SMOOTHING = 0.3
+
+# Observed provisioning durations, keyed by e.g. (region, SKU).  They are
+# kept for the lifetime of the warm Lambda container.
+_ESTIMATES: Dict[Hashable, float] = {}
+_ESTIMATES_LOCK = threading.Lock()
+
+
+def next_poll_delay(
+    attempt: int,
+    retry_after: Optional[str] = None,
+    estimate_key: Optional[Hashable] = None,
+) -> int:
+    """Return how many seconds to wait before polling an operation again.
+
+    attempt is the number of polls already made for the operation.  The
+    delay is an exponential backoff with full jitter, never shorter than
+    the Retry-After returned by Azure.  Before the first poll, the typical
+    duration learned for estimate_key is used, when there is one, so that
+    operations Azure is known to take a while for are not polled early.
+    """
+    backoff = min(POLL_MAX_DELAY_SECONDS, POLL_BASE_DELAY_SECONDS * (2 ** attempt))
+    delay = random.uniform(POLL_BASE_DELAY_SECONDS, max(POLL_BASE_DELAY_SECONDS, backoff))
+
+    if attempt == 0 and estimate_key is not None:
+        estimate = estimated_duration(estimate_key)
+        if estimate is not None:
+            delay = min(POLL_MAX_DELAY_SECONDS, estimate)
+
+    minimum = _parse_retry_after(retry_after)
+    if minimum is not None:
+        delay = max(delay, minimum)
+
+    return max(1, int(round(delay)))
+
+
+def record_duration(
+    estimate_key: Hashable,
+    seconds: float,
+) -> None:
+    """Learn from the observed duration of a completed operation."""
+    if seconds <= 0:
+        return
+
+    with _ESTIMATES_LOCK:
+        previous = _ESTIMATES.get(estimate_key)
+        if previous is None:
+            _ESTIMATES[estimate_key] = seconds
+        else:
+            _ESTIMATES[estimate_key] = (1 - ESTIMATE_SMOOTHING) * previous + ESTIMATE_SMOOTHING * seconds
+
+
+def estimated_duration(estimate_key: Hashable) -> Optional[float]:
+    with _ESTIMATES_LOCK:
+        return _ESTIMATES.get(estimate_key)
+
+
+def _parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+    # ARM sends Retry-After in seconds; HTTP dates are not used by Azure
+    # for long running operations, so they are ignored here.
+    if retry_after is None:
+        return None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return None
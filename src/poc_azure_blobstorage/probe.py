@@ -0,0 +1,119 @@
+import functools
+import logging
+import math
+import os
+import socket
+import time
+import uuid
+
+from typing import (
+    Dict,
+    List,
+    Mapping,
+    Sequence,
+    Tuple,
+)
+from urllib.parse import urlsplit
+
+from . import concurrency, http_client
+
+# Use this logger to forward log messages to CloudWatch Logs.
+LOG = logging.getLogger(__name__)
+
+# Probe blobs are written under this prefix of the container, and deleted
+# once the probe is over.
+PROBE_BLOB_PREFIX = '.cfn-probe'
+
+# Downloads are read in chunks of this size, so a probe holds at most one
+# upload payload and a chunk per worker in memory.
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def resolves(url: str) -> bool:
+    """Whether the host of the URL resolves in DNS yet."""
+    host = urlsplit(url).hostname or ''
+    try:
+        socket.getaddrinfo(host, 443)
+    except socket.gaierror:
+        return False
+    return True
+
+
+def run(container_url: str, headers: Mapping[str, str], blob_size: int, blob_count: int, max_workers: int) -> Dict[str, float]:
+    """Upload then download blob_count blobs of blob_size bytes, up to
+    max_workers at a time, and return the throughput of each phase, in MB
+    per second, and its latency percentiles, in milliseconds."""
+    payload = os.urandom(blob_size)
+    urls = [f"{container_url}/{PROBE_BLOB_PREFIX}/{uuid.uuid4().hex}" for _ in range(blob_count)]
+
+    try:
+        upload_seconds, upload_latencies = _timed_phase(functools.partial(_put_blob, headers=headers, payload=payload), urls, max_workers)
+        download_seconds, download_latencies = _timed_phase(functools.partial(_get_blob, headers=headers), urls, max_workers)
+    finally:
+        # Probe blobs never outlive the probe, even when it failed
+        concurrency.gather(*[functools.partial(_delete_blob, url, headers) for url in urls], max_workers=max_workers)
+
+    total_mb = blob_size * blob_count / 1_000_000
+    return {
+        "UploadMBps": round(total_mb / upload_seconds, 3),
+        "DownloadMBps": round(total_mb / download_seconds, 3),
+        "UploadLatencyP50Ms": _percentile(upload_latencies, 50),
+        "UploadLatencyP99Ms": _percentile(upload_latencies, 99),
+        "DownloadLatencyP50Ms": _percentile(download_latencies, 50),
+        "DownloadLatencyP99Ms": _percentile(download_latencies, 99),
+    }
+
+
+def _timed_phase(call, urls: Sequence[str], max_workers: int) -> Tuple[float, List[float]]:
+    """Run call on every URL in parallel; return the wall time of the
+    phase, in seconds, and the latency call returned for every URL, in
+    milliseconds."""
+    started = time.perf_counter()
+    latencies = concurrency.gather(*[functools.partial(call, url) for url in urls], max_workers=max_workers)
+    return max(time.perf_counter() - started, 1e-6), latencies
+
+
+# Latencies are those of the final HTTP exchange (response.elapsed, from
+# sending the request to parsing the response headers), so retry backoff
+# and waits in the client are not counted as service latency.
+
+def _put_blob(url: str, headers: Mapping[str, str], payload: bytes) -> float:
+
+    response = http_client.request('PUT', url, headers={**headers, 'x-ms-blob-type': 'BlockBlob'}, data=payload)
+
+    if response.status_code != 201:
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
+
+    return response.elapsed.total_seconds() * 1000
+
+
+def _get_blob(url: str, headers: Mapping[str, str]) -> float:
+
+    response = http_client.request('GET', url, headers=dict(headers), stream=True)
+    try:
+        if response.status_code != 200:
+            raise Exception(f"ERROR: {response.status_code} - {response.content}")
+
+        # Time to the last byte, without keeping the blob in memory
+        started = time.perf_counter()
+        for _ in response.iter_content(DOWNLOAD_CHUNK_BYTES):
+            pass
+        return response.elapsed.total_seconds() * 1000 + (time.perf_counter() - started) * 1000
+    finally:
+        response.close()
+
+
+def _delete_blob(url: str, headers: Mapping[str, str]) -> None:
+    try:
+        response = http_client.request('DELETE', url, headers=dict(headers))
+        if response.status_code not in (202, 404):
+            LOG.warning(f"Could not delete probe blob {url}: {response.status_code} - {response.content}")
+    except Exception as e:
+        LOG.warning(f"Could not delete probe blob {url}: {e}")
+
+
+def _percentile(values: Sequence[float], percentile: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percentile / 100 * len(ordered)))
+    return round(ordered[rank - 1], 3)
@@ -0,0 +1,87 @@
+import logging
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+# Use this logger to forward log messages to CloudWatch Logs.
+LOG = logging.getLogger(__name__)
+
+# How long a storage account read is served from the cache without asking
+# ARM again.  Keep it short: another Lambda container may change or delete
+# the account, and only this container's writes invalidate the cache.
+READ_CACHE_TTL_SECONDS = float(os.environ.get("AZURE_READ_CACHE_TTL_SECONDS", "5"))
+
+# Entries kept at most; the least recently used ones are dropped first.
+READ_CACHE_MAX_ENTRIES = int(os.environ.get("AZURE_READ_CACHE_MAX_ENTRIES", "256"))
+
+# fetch(etag) returns (status code, body, etag).  With an etag, it sends
+# If-None-Match, and a 304 status code means the cached body is still current.
+Fetch = Callable[[Optional[str]], Tuple[int, Any, Optional[str]]]
+
+# Successful storage account reads, by lowercased ARM resource ID, with the
+# ETag ARM returned.  An entry is served as is for READ_CACHE_TTL_SECONDS,
+# then revalidated with If-None-Match; it is dropped by invalidate() when
+# this container writes the account, and by any read that does not succeed.
+_READ_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_READ_CACHE_LOCK = threading.Lock()
+
+
+def get_cached(resource_id: str, fetch: Fetch) -> Tuple[int, Any]:
+    """Return the status code and body of a read of the resource, from the
+    cache when it is fresh, or revalidated with its ETag when it is not."""
+    key = _cache_key(resource_id)
+
+    with _READ_CACHE_LOCK:
+        entry = _READ_CACHE.get(key)
+        if entry is not None:
+            _READ_CACHE.move_to_end(key)
+
+    if entry is not None and entry["expires_at"] > time.monotonic():
+        LOG.debug(f"Read of {resource_id} served from the cache")
+        return 200, entry["body"]
+
+    status_code, body, etag = fetch(entry["etag"] if entry else None)
+
+    if status_code == 304 and entry is not None:
+        LOG.debug(f"Cached read of {resource_id} revalidated")
+        status_code, body, etag = 200, entry["body"], entry["etag"]
+
+    # Only successful reads are cached; anything else is always asked again
+    if status_code == 200:
+        _store(key, body, etag)
+    else:
+        invalidate(resource_id)
+
+    return status_code, body
+
+
+def invalidate(resource_id: str) -> None:
+    """Drop the cached read of a resource, e.g. after creating or deleting it."""
+    with _READ_CACHE_LOCK:
+        _READ_CACHE.pop(_cache_key(resource_id), None)
+
+
+def _cache_key(resource_id: str) -> str:
+    # ARM resource IDs are case insensitive
+    return resource_id.lower()
+
+
+def _store(key: str, body: Any, etag: Optional[str]) -> None:
+    with _READ_CACHE_LOCK:
+        _READ_CACHE[key] = {
+            "body": body,
+            "etag": etag,
+            "expires_at": time.monotonic() + READ_CACHE_TTL_SECONDS,
+        }
+        _READ_CACHE.move_to_end(key)
+        while len(_READ_CACHE) > READ_CACHE_MAX_ENTRIES:
+            _READ_CACHE.popitem(last=False)
@@ -0,0 +1,39 @@
+import threading
+
+from typing import (
+    Set,
+    Tuple,
+)
+
+ResourceGroupKey = Tuple[str, str]
+
+# Resource groups known to exist, by subscription.  The set lives at module
+# level, so it survives across warm invocations of the same Lambda
+# container: the resource group shared by every account is checked once per
+# container rather than PUT on every CREATE.  Entries are dropped when ARM
+# reports the resource group missing, e.g. after it was deleted underneath.
+_KNOWN_RESOURCE_GROUPS: Set[ResourceGroupKey] = set()
+_KNOWN_RESOURCE_GROUPS_LOCK = threading.Lock()
+
+
+def is_known(subscription_id: str, resource_group: str) -> bool:
+    """Return whether the resource group was seen to exist."""
+    with _KNOWN_RESOURCE_GROUPS_LOCK:
+        return _key(subscription_id, resource_group) in _KNOWN_RESOURCE_GROUPS
+
+
+def remember(subscription_id: str, resource_group: str) -> None:
+    """Record that the resource group exists."""
+    with _KNOWN_RESOURCE_GROUPS_LOCK:
+        _KNOWN_RESOURCE_GROUPS.add(_key(subscription_id, resource_group))
+
+
+def forget(subscription_id: str, resource_group: str) -> None:
+    """Drop the resource group, e.g. when ARM answers ResourceGroupNotFound."""
+    with _KNOWN_RESOURCE_GROUPS_LOCK:
+        _KNOWN_RESOURCE_GROUPS.discard(_key(subscription_id, resource_group))
+
+
+def _key(subscription_id: str, resource_group: str) -> ResourceGroupKey:
+    # Subscription IDs and resource group names are case insensitive
+    return (subscription_id.lower(), resource_group.lower())
@@ -0,0 +1,217 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Mapping,
+    Optional,
+)
+from urllib.parse import urlsplit
+
+from . import endpoints
+from .exceptions import AzureThrottlingException
+
+if TYPE_CHECKING:
+    import requests  #type: ignore
+
+# Use this logger to forward log messages to CloudWatch Logs.
+LOG = logging.getLogger(__name__)
+
+# Responses worth retrying: throttling, and transient gateway or service errors.
+THROTTLED_STATUS_CODES = (429,)
+TRANSIENT_STATUS_CODES = (408, 500, 502, 503, 504)
+
+# Attempts per request, and the longest single wait the engine accepts.
+# Longer waits are not spent sleeping in Lambda: AzureThrottlingException
+# is raised, and the handler retries on a later callback (or fails with the
+# Throttling error code, that CloudFormation retries).
+RETRY_MAX_ATTEMPTS = int(os.environ.get("AZURE_RETRY_MAX_ATTEMPTS", "4"))
+RETRY_MAX_WAIT_SECONDS = float(os.environ.get("AZURE_RETRY_MAX_WAIT_SECONDS", "20"))
+RETRY_BASE_DELAY_SECONDS = 0.5
+
+# Request budget shared by every caller targeting the same Azure
+# subscription through ARM in this container.  AAD and blob requests are
+# not limited here: they are throttled per storage account or tenant, not
+# per subscription, and rely on the 429/503 retries below.
+RATE_LIMIT_PER_SECOND = float(os.environ.get("AZURE_RATE_LIMIT_PER_SECOND", "20"))
+RATE_LIMIT_BURST = float(os.environ.get("AZURE_RATE_LIMIT_BURST", "40"))
+
+# Below this many remaining ARM requests, the budget is slowed down.
+RATE_LIMIT_LOW_REMAINING = 100
+
+RATE_LIMIT_REMAINING_HEADERS = (
+    "x-ms-ratelimit-remaining-subscription-reads",
+    "x-ms-ratelimit-remaining-subscription-writes",
+    "x-ms-ratelimit-remaining-subscription-deletes",
+    "x-ms-ratelimit-remaining-tenant-reads",
+    "x-ms-ratelimit-remaining-tenant-writes",
+)
+
+SUBSCRIPTION_PATTERN = re.compile(r"/subscriptions/([^/?]+)", re.IGNORECASE)
+ARM_BATCH_PATH = "/batch"
+
+
+class RateBudget:
+    """Token bucket that callers sharing an Azure rate limit draw from."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, max_wait: float) -> float:
+        """Take one request from the budget, waiting for it; return the wait.
+
+        Raises AzureThrottlingException rather than waiting over max_wait.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+
+            if waited + wait > max_wait:
+                raise AzureThrottlingException("Request budget for Azure exhausted", retry_after=wait)
+
+            time.sleep(wait)
+            waited += wait
+
+    def block(self, seconds: float) -> None:
+        """Hold every caller back, e.g. after Azure answered with a 429."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """Slow down when ARM reports few remaining requests."""
+        remaining = _remaining_requests(headers)
+        if remaining is None or remaining >= RATE_LIMIT_LOW_REMAINING:
+            return
+
+        with self.lock:
+            self.tokens = min(self.tokens, self.capacity * remaining / RATE_LIMIT_LOW_REMAINING)
+            if remaining <= 0:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + 1)
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+# Budgets live at module level, so every handler invocation running in this
+# warm container backs off together.
+_BUDGETS: Dict[str, RateBudget] = {}
+_BUDGETS_LOCK = threading.Lock()
+
+
+def get_budget(url: str) -> Optional[RateBudget]:
+    key = budget_key(url)
+    if key is None:
+        return None
+
+    with _BUDGETS_LOCK:
+        budget = _BUDGETS.get(key)
+        if budget is None:
+            budget = RateBudget(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+            _BUDGETS[key] = budget
+        return budget
+
+
+def budget_key(url: str) -> Optional[str]:
+    """ARM throttles per subscription (per tenant for batches); requests to
+    other services, e.g. blob endpoints, have no budget."""
+    management_url = endpoints.management_url()
+    if not url.lower().startswith(management_url.lower() + "/"):
+        return None
+
+    path = urlsplit(url[len(management_url):]).path
+    match = SUBSCRIPTION_PATTERN.match(path)
+    if match:
+        return f"subscription:{match.group(1).lower()}"
+    if path.lower() == ARM_BATCH_PATH:
+        return f"tenant:{urlsplit(management_url).netloc.lower()}"
+    return None
+
+
+def is_retryable(response: "requests.Response") -> bool:
+    return response.status_code in THROTTLED_STATUS_CODES + TRANSIENT_STATUS_CODES
+
+
+def send_with_retries(
+    url: str,
+    send: Callable[[], "requests.Response"],
+) -> "requests.Response":
+    """Send a request, retrying throttled and transient failures.
+
+    Raises AzureThrottlingException when Azure is still throttling once the
+    attempts are used up, or asks to wait longer than RETRY_MAX_WAIT_SECONDS.
+    Other failed responses are returned for the caller to handle.
+    """
+    budget = get_budget(url)
+
+    for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+        if budget is not None:
+            budget.acquire(RETRY_MAX_WAIT_SECONDS)
+        response = send()
+        if budget is not None:
+            budget.observe(response.headers)
+
+        if not is_retryable(response):
+            return response
+
+        delay = _retry_delay(response, attempt)
+        throttled = response.status_code in THROTTLED_STATUS_CODES
+        if throttled and budget is not None:
+            budget.block(delay)
+
+        if attempt == RETRY_MAX_ATTEMPTS or delay > RETRY_MAX_WAIT_SECONDS:
+            break
+
+        LOG.info(f"Azure returned {response.status_code} for {urlsplit(url).netloc}, retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+    if throttled:
+        raise AzureThrottlingException(
+            f"Azure is throttling requests to {urlsplit(url).netloc}: {response.status_code} - {response.content}",
+            retry_after=delay,
+        )
+
+    return response
+
+
+def _retry_delay(response: "requests.Response", attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+
+    # Exponential backoff with full jitter
+    return random.uniform(0, RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+
+
+def _remaining_requests(headers: Mapping[str, str]) -> Optional[int]:
+    values = []
+    for header in RATE_LIMIT_REMAINING_HEADERS:
+        value = headers.get(header)
+        if value is not None:
+            try:
+                values.append(int(value))
+            except ValueError:
+                pass
+
+    return min(values) if values else None
@@ -0,0 +1,178 @@
+import base64
+import logging
+import os
+
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+from urllib.parse import quote
+
+from . import http_client
+
+# Use this logger to forward log messages to CloudWatch Logs.
+LOG = logging.getLogger(__name__)
+
+# Size of the blocks copied by Azure straight from S3 (Put Block From URL).
+# Nothing goes through the Lambda function, so blocks can be as large as the
+# blob service accepts.
+SEED_COPY_BLOCK_SIZE = int(os.environ.get("AZURE_SEED_COPY_BLOCK_SIZE_MB", "100")) * 1024 * 1024
+
+# Size of the blocks streamed through the Lambda function, when Azure cannot
+# read the objects from S3.  A block is held in memory per worker, so this
+# times AZURE_SEED_CONCURRENCY bounds the memory used by the copy.
+SEED_UPLOAD_BLOCK_SIZE = int(os.environ.get("AZURE_SEED_UPLOAD_BLOCK_SIZE_MB", "8")) * 1024 * 1024
+
+# Blocks a blob is made of, at most.
+MAX_BLOCKS_PER_BLOB = 50000
+
+# Lifetime of the presigned S3 URLs handed to Azure.
+PRESIGNED_URL_EXPIRY_SECONDS = 3600
+
+# Error codes of the blob service when it cannot read a copy source, e.g.
+# a bucket only reachable from a VPC endpoint; the object is streamed instead.
+COPY_SOURCE_ERROR_CODES = ('CannotVerifyCopySource',)
+
+
+class CopySourceUnreachable(Exception):
+    "When Azure cannot read the presigned S3 URL of an object"
+    pass
+
+
+def blob_url(container_url: str, key: str) -> str:
+    """Return the URL of the blob an S3 object is copied to."""
+    return f"{container_url}/{quote(key, safe='/')}"
+
+
+def list_objects(s3: Any, bucket: str, prefix: str, start_after: Optional[str]) -> Tuple[List[Mapping[str, Any]], Optional[str]]:
+    """Return a page of the objects under the prefix, in key order after
+    start_after, and the key to list the next page after; None after the
+    last page.  Folder markers are left out."""
+    params: Dict[str, Any] = {"Bucket": bucket, "Prefix": prefix}
+    if start_after:
+        params["StartAfter"] = start_after
+
+    page = s3.list_objects_v2(**params)
+
+    contents = page.get("Contents", [])
+    objects = [o for o in contents if not (o["Key"].endswith("/") and o["Size"] == 0)]
+    next_start_after = contents[-1]["Key"] if page.get("IsTruncated") and contents else None
+    return objects, next_start_after
+
+
+def blocks(size: int, server_side: bool) -> List[Tuple[str, int, int]]:
+    """Split an object in the (block ID, first byte, last byte) ranges it is
+    copied in: large blocks when Azure copies them, smaller ones when they
+    are streamed through this function.  The split only depends on its
+    arguments, so a copy resumed on a later callback stages the same blocks."""
+    return _blocks(size, SEED_COPY_BLOCK_SIZE if server_side else SEED_UPLOAD_BLOCK_SIZE)
+
+
+def presigned_url(s3: Any, bucket: str, key: str) -> str:
+    """Return a URL Azure can read the object from."""
+    return s3.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": bucket, "Key": key},
+        ExpiresIn=PRESIGNED_URL_EXPIRY_SECONDS,
+    )
+
+
+def stage_block(
+    s3: Any,
+    bucket: str,
+    key: str,
+    blob_url: str,
+    headers: Mapping[str, str],
+    source_url: Optional[str],
+    block: Tuple[str, int, int],
+) -> bool:
+    """Stage one block of an S3 object in the blob: copied by Azure from
+    source_url, when given, and streamed through this function otherwise.
+
+    Returns False when Azure cannot read source_url, e.g. for a bucket only
+    reachable from a VPC endpoint; the object then has to be streamed.
+    """
+    block_id, start, end = block
+
+    if source_url is None:
+        _put_block(blob_url, headers, s3, bucket, key, block_id, start, end)
+        return True
+
+    try:
+        _put_block_from_url(blob_url, headers, source_url, block_id, start, end)
+    except CopySourceUnreachable as e:
+        LOG.info(f"Azure cannot read s3://{bucket}/{key}: {e}")
+        return False
+
+    return True
+
+
+def commit(blob_url: str, headers: Mapping[str, str], block_ids: Sequence[str]) -> None:
+    """Commit the staged blocks as the content of the blob."""
+    _put_block_list(blob_url, headers, block_ids)
+
+
+def _blocks(size: int, block_size: int) -> List[Tuple[str, int, int]]:
+    """Split an object in (block ID, first byte, last byte) ranges."""
+    block_size = max(block_size, -(-size // MAX_BLOCKS_PER_BLOB))
+
+    # Every block ID of a blob must have the same length
+    return [
+        (base64.b64encode(f"{index:06d}".encode()).decode(), start, min(start + block_size, size) - 1)
+        for index, start in enumerate(range(0, size, block_size))
+    ]
+
+
+def _put_block_from_url(blob_url: str, headers: Mapping[str, str], source_url: str, block_id: str, start: int, end: int) -> None:
+
+    response = http_client.request(
+        'PUT',
+        f"{blob_url}?comp=block&blockid={quote(block_id, safe='')}",
+        headers={
+            **headers,
+            'x-ms-copy-source': source_url,
+            'x-ms-source-range': f'bytes={start}-{end}',
+            'Content-Length': '0',
+        },
+    )
+
+    if response.headers.get('x-ms-error-code') in COPY_SOURCE_ERROR_CODES:
+        raise CopySourceUnreachable(f"{response.status_code} - {response.headers.get('x-ms-error-code')}")
+    if response.status_code != 201:
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
+
+
+def _put_block(blob_url: str, headers: Mapping[str, str], s3: Any, bucket: str, key: str, block_id: str, start: int, end: int) -> None:
+
+    # Read one block at a time, so memory stays bounded whatever the object size
+    data = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")["Body"].read()
+
+    response = http_client.request(
+        'PUT',
+        f"{blob_url}?comp=block&blockid={quote(block_id, safe='')}",
+        headers=headers,
+        data=data,
+    )
+
+    if response.status_code != 201:
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
+
+
+def _put_block_list(blob_url: str, headers: Mapping[str, str], block_ids: Sequence[str]) -> None:
+
+    body = '<?xml version="1.0" encoding="utf-8"?><BlockList>' + ''.join(f'<Latest>{block_id}</Latest>' for block_id in block_ids) + '</BlockList>'
+
+    response = http_client.request(
+        'PUT',
+        f"{blob_url}?comp=blocklist",
+        headers={**headers, 'Content-Type': 'application/xml'},
+        data=body.encode(),
+    )
+
+    if response.status_code != 201:
+        raise Exception(f"ERROR: {response.status_code} - {response.content}")
@@ -0,0 +1,108 @@
+import time
+
+from typing import (
+    Any,
+    Dict,
+    MutableMapping,
+    Optional,
+    Sequence,
+)
+
+from cloudformation_cli_python_lib import OperationStatus  # type: ignore
+
+# States of the CREATE pipeline, in the order they are run.
+CREATE_RG_ENSURE = "RG_ENSURE"
+CREATE_ACCOUNT_PUT = "ACCOUNT_PUT"
+CREATE_ACCOUNT_POLL = "ACCOUNT_POLL"
+CREATE_CONTAINER_PUT = "CONTAINER_PUT"
+CREATE_PROBE = "PROBE"
+CREATE_SEED = "SEED"
+CREATE_SAS = "SAS"
+
+# States of the DELETE pipeline, in the order they are run.
+DELETE_CONTAINERS_DELETE = "CONTAINERS_DELETE"
+DELETE_ACCOUNT_DELETE = "ACCOUNT_DELETE"
+DELETE_ACCOUNT_POLL = "ACCOUNT_DELETE_POLL"
+DELETE_RG_CLEANUP = "RG_CLEANUP"
+
+# Terminal state shared by every pipeline.
+DONE = "DONE"
+
+# Allowed transitions for each state.  A state may also move to itself,
+# e.g. when a long running operation is polled again on the next callback.
+TRANSITIONS: Dict[str, Sequence[str]] = {
+    CREATE_RG_ENSURE: (CREATE_ACCOUNT_PUT,),
+    CREATE_ACCOUNT_PUT: (CREATE_ACCOUNT_POLL, CREATE_CONTAINER_PUT, CREATE_RG_ENSURE),
+    CREATE_ACCOUNT_POLL: (CREATE_CONTAINER_PUT,),
+    CREATE_CONTAINER_PUT: (CREATE_PROBE, CREATE_SEED, CREATE_SAS),
+    CREATE_PROBE: (CREATE_SEED, CREATE_SAS),
+    CREATE_SEED: (CREATE_SAS,),
+    CREATE_SAS: (DONE,),
+    DELETE_CONTAINERS_DELETE: (DELETE_ACCOUNT_DELETE,),
+    DELETE_ACCOUNT_DELETE: (DELETE_ACCOUNT_POLL, DONE),
+    DELETE_ACCOUNT_POLL: (DELETE_RG_CLEANUP, DONE),
+    DELETE_RG_CLEANUP: (DONE,),
+    DONE: (),
+}
+
+
+def new_state_context(
+    initial_state: str,
+    **values: Any,
+) -> Dict[str, Any]:
+    """Return a callback context for a pipeline starting at initial_state.
+
+    The context only holds JSON serializable values, as CloudFormation
+    hands it back verbatim on the next invocation of the handler.
+    """
+    now = _now()
+    context = {
+        "status": OperationStatus.IN_PROGRESS,
+        "state": initial_state,
+        "startedAt": now,
+        "stateEnteredAt": {initial_state: now},
+    }
+    context.update(values)
+
+    return context
+
+
+def has_state(callback_context: MutableMapping[str, Any]) -> bool:
+    """Whether the callback context was written by a state machine pipeline."""
+    return bool(callback_context.get("state"))
+
+
+def current_state(callback_context: MutableMapping[str, Any]) -> str:
+    return callback_context["state"]
+
+
+def transition(
+    callback_context: MutableMapping[str, Any],
+    next_state: str,
+    operation_url: Optional[str] = None,
+) -> None:
+    """Move the pipeline to next_state, recording when it was entered.
+
+    The operation URL of a long running Azure operation started by the
+    current state is kept for the next state to poll; it is cleared
+    otherwise, so a stale URL is never polled again.  The poll counter
+    restarts with every new state.
+    """
+    state = current_state(callback_context)
+    if next_state != state and next_state not in TRANSITIONS[state]:
+        raise ValueError(f"Invalid state transition: {state} -> {next_state}")
+
+    if next_state != state:
+        callback_context.pop("pollAttempt", None)
+
+    callback_context["state"] = next_state
+    callback_context.setdefault("stateEnteredAt", {})[next_state] = _now()
+
+    if operation_url:
+        callback_context["operationUrl"] = operation_url
+    else:
+        callback_context.pop("operationUrl", None)
+
+
+def _now() -> float:
+    return round(time.time(), 3)
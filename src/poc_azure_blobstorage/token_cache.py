@@ -0,0 +1,152 @@
+import logging
+import threading
+import time
+
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+# Use this logger to forward log messages to CloudWatch Logs.
+LOG = logging.getLogger(__name__)
+
+# Tokens are refreshed this many seconds before Azure AD says they expire,
+# so a token handed out here never lapses in the middle of a handler.
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+# Lifetime assumed when the token endpoint does not report one.
+DEFAULT_TOKEN_LIFETIME_SECONDS = 3599
+
+# (tenant, client, resource, credential fingerprint): a token is only handed
+# out to callers presenting the credential it was obtained with.
+TokenKey = Tuple[str, str, str, str]
+
+# The cache lives at module level, so it survives across warm invocations
+# of the same Lambda container and is shared by every handler.
+_TOKEN_CACHE: Dict[TokenKey, Dict[str, Any]] = {}
+_TOKEN_CACHE_LOCK = threading.Lock()
+_TOKEN_FETCH_LOCKS: Dict[TokenKey, threading.Lock] = {}
+
+
+def get_cached_token(
+    tenant_id: str,
+    client_id: str,
+    resource_url: str,
+    credential_fingerprint: str,
+    fetch_token: Callable[[], Mapping[str, Any]],
+) -> Mapping[str, Any]:
+    """Return a cached token for the key, calling fetch_token when needed."""
+    return _get(_token_key(tenant_id, client_id, resource_url, credential_fingerprint), fetch_token)
+
+
+def refresh_rejected_token(access_token: str) -> Optional[str]:
+    """Replace the cached token Azure rejected with a 401, e.g. after its
+    credential was revoked, with one fetched the same way, and return it.
+
+    Concurrent callers rejected with the same token share one fetch.
+    Returns None when the rejected token was not cached here.
+    """
+    with _TOKEN_CACHE_LOCK:
+        key = next((k for k, entry in _TOKEN_CACHE.items() if access_token in (_access_token(entry["token"]), entry["replaces"])), None)
+    if key is None:
+        return None
+
+    with _fetch_lock(key):
+        with _TOKEN_CACHE_LOCK:
+            entry = _TOKEN_CACHE[key]
+        if _access_token(entry["token"]) != access_token:
+            return _access_token(entry["token"])
+
+        LOG.info(f"Azure rejected the cached token for resource {key[2]}, fetching a new one")
+        return _access_token(_fetch(key, entry["fetch"], replaces=access_token))
+
+
+def _get(key: TokenKey, fetch_token: Callable[[], Mapping[str, Any]]) -> Mapping[str, Any]:
+    token = _lookup(key)
+    if token is not None:
+        return token
+
+    # Only one caller per key goes to Azure AD; the others wait for it and
+    # then pick the fresh token up from the cache.
+    with _fetch_lock(key):
+        token = _lookup(key)
+        if token is not None:
+            return token
+
+        return _fetch(key, fetch_token)
+
+
+def _fetch(key: TokenKey, fetch_token: Callable[[], Mapping[str, Any]], replaces: Optional[str] = None) -> Mapping[str, Any]:
+    fetched_at = time.time()
+    token = fetch_token()
+    expires_at = _token_expires_at(token, fetched_at)
+
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE[key] = {
+            "token": token,
+            "expires_at": expires_at,
+            "fetch": fetch_token,
+            "replaces": replaces,
+        }
+    LOG.debug(f"Cached new Azure token for resource {key[2]}")
+
+    return token
+
+
+def _token_key(
+    tenant_id: str,
+    client_id: str,
+    resource_url: str,
+    credential_fingerprint: str,
+) -> TokenKey:
+    # 'https://storage.azure.com/' and 'https://storage.azure.com' are the
+    # same audience as far as Azure AD is concerned.
+    return (tenant_id, client_id, resource_url.rstrip("/"), credential_fingerprint)
+
+
+def _access_token(token: Mapping[str, Any]) -> Optional[str]:
+    # Management tokens are reshaped with 'accessToken', storage tokens keep
+    # the 'access_token' of the OAuth2 endpoint
+    return token.get("accessToken") or token.get("access_token")
+
+
+def _lookup(key: TokenKey) -> Optional[Mapping[str, Any]]:
+    with _TOKEN_CACHE_LOCK:
+        entry = _TOKEN_CACHE.get(key)
+
+    if entry and entry["expires_at"] - TOKEN_REFRESH_MARGIN_SECONDS > time.time():
+        return entry["token"]
+
+    return None
+
+
+def _fetch_lock(key: TokenKey) -> threading.Lock:
+    with _TOKEN_CACHE_LOCK:
+        return _TOKEN_FETCH_LOCKS.setdefault(key, threading.Lock())
+
+
+def _token_expires_at(
+    token: Mapping[str, Any],
+    fetched_at: float,
+) -> float:
+    # Management tokens carry 'expiresIn', while the raw OAuth2 endpoint
+    # returns 'expires_in' and an epoch 'expires_on'.  The relative
+    # lifetime is preferred as it does not depend on clocks.
+    for field in ("expiresIn", "expires_in"):
+        if token.get(field) is not None:
+            try:
+                return fetched_at + float(token[field])
+            except (TypeError, ValueError):
+                pass
+
+    if token.get("expires_on") is not None:
+        try:
+            return float(token["expires_on"])
+        except (TypeError, ValueError):
+            pass
+
+    return fetched_at + DEFAULT_TOKEN_LIFETIME_SECONDS
@@ -0,0 +1,730 @@
+"""Local stand-in for the Azure endpoints used by the POC::Azure::BlobStorage handlers.
+
+The emulator serves:
+
+- the Azure AD client credentials token endpoint;
+- the ARM resource group, resources and storage account endpoints: storage
+  account creation is a 202 + Location + Retry-After long running
+  operation, and lists are paged with nextLink, as in Azure;
+- the ARM name availability, list keys and batch endpoints;
+- the blob container endpoint, and Get User Delegation Key;
+- the block blob endpoints: Put Blob, Put Block, Put Block From URL,
+  Put Block List, Get Blob and Delete Blob.
+
+Latency, throttling (429) and failure (500) injection are configurable.
+
+Run it, then point the handlers at it through AZURE_EMULATOR_URL:
+
+    python tools/azure_emulator.py --port 8080 --latency-ms 40 --throttle-rate 0.05
+    export AZURE_EMULATOR_URL=http://127.0.0.1:8080
+
+Request counters are available from GET /_emulator/stats, and
+POST /_emulator/reset drops every emulated resource and counter.
+"""
+import argparse
+import base64
+import datetime
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+from urllib.parse import parse_qs, urlsplit
+
+API_PREFIX = "/subscriptions/(?P<subscription>[^/]+)"
+RESOURCE_GROUP_PATH = API_PREFIX + "/resourcegroups/(?P<group>[^/]+)"
+RESOURCES_PATH = RESOURCE_GROUP_PATH + "/resources"
+STORAGE_ACCOUNTS_PATH = RESOURCE_GROUP_PATH + "/providers/microsoft.storage/storageaccounts"
+STORAGE_ACCOUNT_PATH = STORAGE_ACCOUNTS_PATH + "/(?P<account>[^/]+)"
+ACCOUNT_KEYS_PATH = STORAGE_ACCOUNT_PATH + "/listkeys"
+OPERATION_PATH = API_PREFIX + "/providers/microsoft.storage/locations/(?P<location>[^/]+)/asyncoperations/(?P<operation>[^/]+)"
+NAME_AVAILABILITY_PATH = API_PREFIX + "/providers/microsoft.storage/checknameavailability"
+TOKEN_PATH = "/(?P<tenant>[^/]+)/oauth2/token"
+BATCH_PATH = "/batch"
+BLOB_SERVICE_PATH = "/blob/(?P<account>[^/]+)/?"
+CONTAINER_PATH = "/blob/(?P<account>[^/]+)/(?P<container>[^/]+)"
+BLOB_PATH = CONTAINER_PATH + "/(?P<blob>.+)"
+
+Response = Tuple[int, Dict[str, str], Any]
+
+
+@dataclass
+class EmulatorConfig:
+    """Behaviour of the emulated Azure endpoints."""
+
+    # Added to every request, in milliseconds.
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    # Probability of answering a request with 429 or 500 instead of serving it.
+    throttle_rate: float = 0.0
+    failure_rate: float = 0.0
+    # How long a storage account takes to provision, and the Retry-After
+    # returned with long running operations and throttled requests.
+    provisioning_seconds: float = 5.0
+    retry_after_seconds: int = 1
+    token_lifetime_seconds: int = 3599
+    # Client secret the token endpoint accepts; any secret when unset.
+    # Client assertions are accepted when they are well formed.
+    client_secret: Optional[str] = None
+    # ARM requests allowed per subscription before answering 429, reported
+    # in the x-ms-ratelimit-remaining-subscription-* headers like ARM does.
+    arm_request_quota: int = 12000
+    # Storage accounts per page of a list, before a nextLink is returned.
+    list_page_size: int = 100
+    seed: Optional[int] = None
+
+
+@dataclass
+class _AzureState:
+    resource_groups: Dict[Tuple[str, str], Dict[str, Any]] = field(default_factory=dict)
+    accounts: Dict[Tuple[str, str, str], Dict[str, Any]] = field(default_factory=dict)
+    operations: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    containers: Dict[Tuple[str, str], Dict[str, Any]] = field(default_factory=dict)
+    blobs: Dict[Tuple[str, str, str], Dict[str, Any]] = field(default_factory=dict)
+    stats: Counter = field(default_factory=Counter)
+    arm_requests: Counter = field(default_factory=Counter)
+
+
+class AzureEmulator:
+    """An emulator server running on a background thread."""
+
+    def __init__(
+        self,
+        config: Optional[EmulatorConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.config = config or EmulatorConfig()
+        self.state = _AzureState()
+        self.lock = threading.RLock()
+        self.random = random.Random(self.config.seed)
+        self.server = ThreadingHTTPServer((host, port), _handler_class(self))
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "AzureEmulator":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.state.stats)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.state = _AzureState()
+
+    def __enter__(self) -> "AzureEmulator":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+
+def _handler_class(emulator: AzureEmulator) -> type:
+
+    class Handler(_EmulatorRequestHandler):
+        pass
+
+    Handler.emulator = emulator
+    return Handler
+
+
+class _EmulatorRequestHandler(BaseHTTPRequestHandler):
+
+    # Keep connections open, like the Azure front ends do.
+    protocol_version = "HTTP/1.1"
+    emulator: AzureEmulator
+    raw_body: bytes = b""
+    copy_source: Optional[Tuple[int, bytes]] = None
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_HEAD(self) -> None:
+        self._dispatch("HEAD")
+
+    def do_PUT(self) -> None:
+        self._dispatch("PUT")
+
+    def do_PATCH(self) -> None:
+        self._dispatch("PATCH")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.headers.get('Host')}"
+
+    def _dispatch(self, method: str) -> None:
+        emulator = self.emulator
+        config = emulator.config
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        if parts.path.startswith("/_emulator/"):
+            self._send(*self._control(method, parts.path))
+            return
+
+        route, handler, params = _match_route(method, parts.path)
+        self.raw_body = body
+
+        # Put Block From URL reads its source before taking the lock, as the
+        # source may take a while to answer
+        self.copy_source = _read_copy_source(self.headers) if self.headers.get("x-ms-copy-source") else None
+
+        with emulator.lock:
+            emulator.state.stats["requests"] += 1
+            emulator.state.stats[f"requests.{route.split('.')[0]}"] += 1
+            emulator.state.stats[f"route.{route}"] += 1
+            emulator.state.stats["bytes_in"] += len(body)
+            throttled = emulator.random.random() < config.throttle_rate
+            failed = not throttled and emulator.random.random() < config.failure_rate
+
+        ratelimit_headers: Dict[str, str] = {}
+        subscription = re.match(API_PREFIX, parts.path, flags=re.IGNORECASE)
+        if subscription and route.startswith("arm."):
+            with emulator.lock:
+                emulator.state.arm_requests[subscription.group("subscription")] += 1
+                remaining = config.arm_request_quota - emulator.state.arm_requests[subscription.group("subscription")]
+            kind = "reads" if method in ("GET", "HEAD") else "writes" if method in ("PUT", "PATCH", "POST") else "deletes"
+            ratelimit_headers[f"x-ms-ratelimit-remaining-subscription-{kind}"] = str(max(remaining, 0))
+            throttled = throttled or remaining < 0
+
+        delay_ms = config.latency_ms + emulator.random.uniform(0, config.latency_jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
+
+        if throttled and route != "unknown":
+            self._count("throttled")
+            self._send(429, {"Retry-After": str(config.retry_after_seconds), **ratelimit_headers}, _error("TooManyRequests", "Emulated throttling"))
+        elif failed and route != "unknown":
+            self._count("failed")
+            self._send(500, {}, _error("InternalServerError", "Emulated failure"))
+        else:
+            with emulator.lock:
+                status, headers, response_body = handler(self, params, query, _parse_body(body))
+            self._send(status, {**ratelimit_headers, **headers}, response_body)
+
+    def _count(self, key: str, value: int = 1) -> None:
+        with self.emulator.lock:
+            self.emulator.state.stats[key] += value
+
+    def _control(self, method: str, path: str) -> Response:
+        if method == "GET" and path == "/_emulator/stats":
+            return 200, {}, self.emulator.stats()
+        if method == "POST" and path == "/_emulator/reset":
+            self.emulator.reset()
+            return 204, {}, None
+        if method == "GET" and path == "/_emulator/config":
+            return 200, {}, asdict(self.emulator.config)
+        return 404, {}, _error("NotFound", path)
+
+    def _send(self, status: int, headers: Mapping[str, str], body: Any) -> None:
+        if body is None:
+            payload = b""
+        elif isinstance(body, bytes):
+            payload = body
+        else:
+            payload = json.dumps(body).encode()
+            headers = {"Content-Type": "application/json", **headers}
+
+        self._count("bytes_out", len(payload))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(payload)
+
+
+# Route handlers.  They run with the emulator lock held, and return the
+# status code, the response headers and a JSON serializable body.
+def _token(request: _EmulatorRequestHandler, params: Dict[str, str], query: Dict[str, str], body: Any) -> Response:
+    body = body or {}
+    if body.get("grant_type") not in ("client_credentials", None) or not body.get("client_id"):
+        return 400, {}, {"error": "invalid_request", "error_description": "Emulated AADSTS900144"}
+
+    if body.get("client_assertion_type"):
+        segments = (body.get("client_assertion") or "").split(".")
+        if len(segments) != 3 or not all(segments):
+            return 401, {}, {"error": "invalid_client", "error_description": "Emulated AADSTS700027"}
+        request._count("client_assertions")
+    elif not body.get("client_secret") or request.emulator.config.client_secret not in (None, body["client_secret"]):
+        return 401, {}, {"error": "invalid_client", "error_description": "Emulated AADSTS7000215"}
+
+    lifetime = request.emulator.config.token_lifetime_seconds
+    request._count("tokens_issued")
+    return 200, {}, {
+        "token_type": "Bearer",
+        "expires_in": str(lifetime),
+        "expires_on": str(int(time.time()) + lifetime),
+        "resource": body.get("resource", ""),
+        "access_token": f"emulated-{uuid.uuid4().hex}",
+    }
+
+
+def _resource_group(request: _EmulatorRequestHandler, params: Dict[str, str], query: Dict[str, str], body: Any) -> Response:
+    state = request.emulator.state
+    key = (params["subscription"], params["group"].lower())
+    group = state.resource_groups.get(key)
+
+    if request.command == "PUT":
+        created = group is None
+        group = state.resource_groups.setdefault(key, {
+            "id": f"/subscriptions/{params['subscription']}/resourceGroups/{params['group']}",
+            "name": params["group"],
+            "type": "Microsoft.Resources/resourceGroups",
+            "location": (body or {}).get("location", "eastus"),
+            "tags": (body or {}).get("tags", {}),
+            "properties": {"provisioningState": "Succeeded"},
+        })
+        return (201 if created else 200), {}, group
+
+    if group is None:
+        return 404, {}, _error("ResourceGroupNotFound", f"Resource group '{params['group']}' could not be found.")
+
+    if request.command == "DELETE":
+        del state.resource_groups[key]
+        for account_key in [k for k in state.accounts if k[:2] == key]:
+            _drop_account(state, account_key)
+        return 200, {}, None
+
+    return (204 if request.command == "HEAD" else 200), {}, group
+
+
+def _resources(request: _EmulatorRequestHandler, params: Dict[str, str], query: Dict[str, str], body: Any) -> Response:
+    state = request.emulator.state
+    group_key = (params["subscription"], params["group"].lower())
+
+    if group_key not in state.resource_groups:
+        return 404, {}, _error("ResourceGroupNotFound", f"Resource group '{params['group']}' could not be found.")
+
+    resources = [
+        {"id": a["id"], "name": a["name"], "type": a["type"], "location": a["location"]}
+        for k, a in state.accounts.items() if k[:2] == group_key
+    ]
+    if "$top" in query:
+        resources = resources[:int(query["$top"])]
+    return 200, {}, {"value": resources}
+
+
+def _storage_account(request: _EmulatorRequestHandler, params: Dict[str, str], query: Dict[str, str], body: Any) -> Response:
+    state = request.emulator.state
+    config = request.emulator.config
+    group_key = (params["subscription"], params["group"].lower())
+    key = group_key + (params["account"].lower(),)
+    account = state.accounts.get(key)
+
+    if request.command == "PUT":
+        if group_key not in state.resource_groups:
+            return 404, {}, _error("ResourceGroupNotFound", f"Resource group '{params['group']}' could not be found.")
+        if account is not None:
+            return 200, {}, account
+        if any(k[2] == key[2] for k in state.accounts):
+            return 409, {}, _error("StorageAccountAlreadyTaken", f"The storage account named {params['account']} is already taken.")
+
+        body = body or {}
+        location = body.get("location", "eastus")
+        state.accounts[key] = {
+            "id": f"/subscriptions/{params['subscription']}/resourceGroups/{params['group']}/providers/Microsoft.Storage/storageAccounts/{params['account']}",
+            "name": params["account"],
+            "type": "Microsoft.Storage/storageAccounts",
+            "location": location,
+            "sku": body.get("sku", {"name": "Standard_LRS"}),
+            "kind": body.get("kind", "StorageV2"),
+            "tags": body.get("tags", {}),
+            "properties": {
+                "provisioningState": "Creating",
+                "primaryEndpoints": {"blob": f"{request.base_url}/blob/{params['account']}/"},
+                **body.get("properties", {}),
+            },
+        }
+        operation = uuid.uuid4().hex
+        state.operations[operation] = {
+            "account": key,
+            "ready_at": time.time() + config.provisioning_seconds,
+        }
+        location_url = f"{request.base_url}/subscriptions/{params['subscription']}/providers/Microsoft.Storage/locations/{location}/asyncoperations/{operation}?monitor=true&api-version=2021-08-01"
+        return 202, {"Location": location_url, "Retry-After": str(config.retry_after_seconds)}, None
+
+    if request.command == "PATCH":
+        if account is None:
+            return 404, {}, _error("ResourceNotFound", f"The Resource 'Microsoft.Storage/storageAccounts/{params['account']}' was not found.")
+        body = body or {}
+        for name in ("sku", "kind", "tags"):
+            if name in body:
+                account[name] = body[name]
+        account["properties"].update(body.get("properties", {}))
+        return 200, {}, account
+
+    if request.command == "DELETE":
+        if account is None:
+            return 204, {}, None
+        _drop_account(state, key)
+        return 200, {}, None
+
+    if account is None:
+        return 404, {}, _error("ResourceNotFound", f"The Resource 'Microsoft.Storage/storageAccounts/{params['account']}' was not found.")
+
+    etag = '"' + hashlib.sha1(json.dumps(account, sort_keys=True).encode()).hexdigest() + '"'
+    if request.headers.get("If-None-Match") == etag:
+        return 304, {"ETag": etag}, None
+    return 200, {"ETag": etag}, account
+
+
+def _name_availability(request: _EmulatorRequestHandler, params: Dict[str, str], query: Dict[str, str], body: Any) -> Response:
+    name = (body or {}).get("name", "")
+
+    if not re.fullmatch("[a-z0-9]{3,24}", name):
+        return 200, {}, {"nameAvailable": False, "reason": "AccountNameInvalid", "message": f"{name} is not a valid storage account name."}
+    if any(k[2] == name for k in request.emulator.state.accounts):
+        return 200, {}, {"nameAvailable": False, "reason": "AlreadyExists", "message": f"The storage account named {name} is already taken."}
+    return 200, {}, {"nameAvailable": True}
+
+
+def _storage_accounts(request: _EmulatorRequestHandler, params: Dict[str, str], query: Dict[str, str], body: Any) -> Response:
+    state = request.emulator.state
+    group_key = (params["subscription"], params["group"].lower())
+
+    if group_key not in state.resource_groups:
+        return 404, {}, _error("ResourceGroupNotFound", f"Resource group '{params['group']}' could not be found.")
+
+    # Pages are cut in account name order, and continue after $skiptoken
+    accounts = sorted((a for k, a in state.accounts.items() if k[:2] == group_key), key=lambda a: a["name"].lower())
+    skip = query.get("$skiptoken", "")
+    page = [a for a in accounts if a["name"].lower() > skip][:request.emulator.config.list_page_size]
+
+    result: Dict[str, Any] = {"value": page}
+    if page and page[-1] is not accounts[-1]:
+        path = urlsplit(request.path).path
+        result["nextLink"] = f"{request.base_url}{path}?api-version={query.get('api-version', '')}&$skiptoken={page[-1]['name'].lower()}"
+    return 200, {}, result
+
+
+def _operation(request: _EmulatorRequestHandler, params: Dict[str, str], query: Dict[str, str], body: Any) -> Response:
+    state = request.emulator.state
+    operation = state.operations.get(params["operation"])
+
+    if operation is None:
+        return 404, {}, _error("NotFound", "Unknown operation")
+
+    if time.time() < operation["ready_at"]:
+        return 202, {"Location": f"{request.base_url}{request.path}", "Retry-After": str(request.emulator.config.retry_after_seconds)}, None
+
+    account = state.accounts.get(operation["account"])
+    if account is None:
+        return 404, {}, _error("ResourceNotFound", "The storage account was deleted")
+
+    account["properties"]["provisioningState"] = "Succeeded"
+    return 200, {}, account
+
+
+class _BatchItemRequest:
+    """One request of an ARM batch, handed to the route handlers in place
+    of the HTTP request of the batch itself."""
+
+    raw_body = b""
+    copy_source = None
+
+    def __init__(self, batch: _EmulatorRequestHandler, method: str, path: str) -> None:
+        self.emulator = batch.emulator
+        self.command = method
+        self.path = path
+        self.headers = batch.headers
+        self.base_url = batch.base_url
+        self._count = batch._count
+
+
+def _batch(request: _EmulatorRequestHandler, params: Dict[str, str], query: Dict[str, str], body: Any) -> Response:
+    items = (body or {}).get("requests") or []
+    if not items:
+        return 400, {}, _error("InvalidBatchRequest", "The batch has no requests")
+
+    # Every request of the batch runs, and is counted, as if sent on its own
+    responses = []
+    for item in items:
+        parts = urlsplit(item["url"])
+        item_query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        route, handler, item_params = _match_route(item["httpMethod"], parts.path)
+        request._count(f"route.{route}")
+        request._count("batch_items")
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        status, headers, content = handler(_BatchItemRequest(request, item["httpMethod"], path), item_params, item_query, item.get("content"))
+        responses.append({"name": item.get("name"), "httpStatusCode": status, "headers": headers, "content": content})
+
+    return 200, {}, {"responses": responses}
+
+
+def _account_keys(request: _EmulatorRequestHandler, params: Dict[str, str], query: Dict[str, str], body: Any) -> Response:
+    key = (params["subscription"], params["group"].lower(), params["account"].lower())
+    if key not in request.emulator.state.accounts:
+        return 404, {}, _error("ResourceNotFound", "The storage account was not found")
+
+    request._count("account_keys_listed")
+    return 200, {}, {"keys": [
+        {"keyName": name, "value": _account_key(params["account"].lower(), name), "permissions": "FULL"}
+        for name in ("key1", "key2")
+    ]}
+
+
+def _blob_service(request: _EmulatorRequestHandler, params: Dict[str, str], query: Dict[str, str], body: Any) -> Response:
+    if query.get("restype") != "service" or query.get("comp") != "userdelegationkey":
+        return 400, {}, _error("InvalidQueryParameterValue", "comp")
+
+    key_info = dict(re.findall(r"<(Start|Expiry)>([^<]*)</", request.raw_body.decode()))
+    if "Expiry" not in key_info:
+        return 400, {"x-ms-error-code": "InvalidXmlDocument"}, _error("InvalidXmlDocument", "Expiry is required")
+    start = key_info.get("Start") or datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    request._count("user_delegation_keys_issued")
+    return 200, {"Content-Type": "application/xml"}, (
+        '<?xml version="1.0" encoding="utf-8"?><UserDelegationKey>'
+        f'<SignedOid>{uuid.uuid4()}</SignedOid><SignedTid>{uuid.uuid4()}</SignedTid>'
+        f'<SignedStart>{start}</SignedStart><SignedExpiry>{key_info["Expiry"]}</SignedExpiry>'
+        '<SignedService>b</SignedService><SignedVersion>2019-02-02</SignedVersion>'
+        f'<Value>{base64.b64encode(uuid.uuid4().bytes * 2).decode()}</Value>'
+        '</UserDelegationKey>'
+    ).encode()
+
+
+def _container(request: _EmulatorRequestHandler, params: Dict[str, str], query: Dict[str, str], body: Any) -> Response:
+    state = request.emulator.state
+    account_name = params["account"].lower()
+    key = (account_name, params["container"])
+    account = next((a for k, a in state.accounts.items() if k[2] == account_name), None)
+    public_access = request.headers.get("x-ms-blob-public-access")
+    metadata = {k[len("x-ms-meta-"):]: v for k, v in request.headers.items() if k.lower().startswith("x-ms-meta-")}
+
+    if query.get("restype") != "container":
+        return 400, {}, _error("InvalidQueryParameterValue", "restype")
+    if account is None or account["properties"]["provisioningState"] != "Succeeded":
+        return 404, {}, _error("ResourceNotFound", "The specified resource does not exist.")
+    if request.command == "PUT" and public_access and not account["properties"].get("allowBlobPublicAccess", False):
+        return 409, {}, _error("PublicAccessNotPermitted", "Public access is not permitted on this storage account.")
+
+    if request.command == "PUT" and not query.get("comp"):
+        if key in state.containers:
+            return 409, {"x-ms-error-code": "ContainerAlreadyExists"}, _error("ContainerAlreadyExists", "The specified container already exists.")
+        state.containers[key] = {
+            "publicAccess": public_access,
+            "metadata": metadata,
+        }
+        return 201, {"ETag": f'"{uuid.uuid4().hex}"'}, None
+
+    if key not in state.containers:
+        return 404, {"x-ms-error-code": "ContainerNotFound"}, _error("ContainerNotFound", "The specified container does not exist.")
+
+    if request.command == "PUT" and query.get("comp") == "acl":
+        state.containers[key]["publicAccess"] = public_access
+        return 200, {"ETag": f'"{uuid.uuid4().hex}"'}, None
+    if request.command == "PUT" and query.get("comp") == "metadata":
+        state.containers[key]["metadata"] = metadata
+        return 200, {"ETag": f'"{uuid.uuid4().hex}"'}, None
+    if request.command == "PUT":
+        return 400, {}, _error("InvalidQueryParameterValue", "comp")
+
+    if request.command == "DELETE":
+        del state.containers[key]
+        for blob_key in [k for k in state.blobs if k[:2] == key]:
+            del state.blobs[blob_key]
+        return 202, {}, None
+
+    return 200, {}, None
+
+
+def _blob(request: _EmulatorRequestHandler, params: Dict[str, str], query: Dict[str, str], body: Any) -> Response:
+    state = request.emulator.state
+    container_key = (params["account"].lower(), params["container"])
+    key = (*container_key, params["blob"])
+
+    if container_key not in state.containers:
+        return 404, {"x-ms-error-code": "ContainerNotFound"}, _error("ContainerNotFound", "The specified container does not exist.")
+
+    if request.command == "PUT" and query.get("comp") == "block":
+        if not query.get("blockid"):
+            return 400, {}, _error("InvalidQueryParameterValue", "blockid")
+        if request.copy_source is not None:
+            status, data = request.copy_source
+            if status not in (200, 206):
+                return status if status in (401, 403, 404) else 409, {"x-ms-error-code": "CannotVerifyCopySource"}, _error("CannotVerifyCopySource", f"The copy source answered {status}")
+            request._count("blob.bytes_copied_from_url", len(data))
+        else:
+            data = request.raw_body
+        state.blobs.setdefault(key, {"blocks": {}, "data": None})["blocks"][query["blockid"]] = data
+        return 201, {}, None
+
+    if request.command == "PUT" and query.get("comp") == "blocklist":
+        block_ids = re.findall(r"<(?:Latest|Uncommitted|Committed)>([^<]*)</", request.raw_body.decode())
+        blocks = state.blobs.get(key, {"blocks": {}})["blocks"]
+        if any(block_id not in blocks for block_id in block_ids):
+            return 400, {"x-ms-error-code": "InvalidBlockList"}, _error("InvalidBlockList", "The specified block list is invalid.")
+        state.blobs[key] = {"blocks": {}, "data": b"".join(blocks[block_id] for block_id in block_ids)}
+        return 201, {"ETag": f'"{uuid.uuid4().hex}"'}, None
+
+    if request.command == "PUT" and not query.get("comp"):
+        if request.headers.get("x-ms-blob-type") != "BlockBlob":
+            return 400, {"x-ms-error-code": "InvalidHeaderValue"}, _error("InvalidHeaderValue", "x-ms-blob-type")
+        state.blobs[key] = {"blocks": {}, "data": request.raw_body}
+        return 201, {"ETag": f'"{uuid.uuid4().hex}"'}, None
+
+    blob = state.blobs.get(key)
+    if request.command == "DELETE" and blob is not None:
+        del state.blobs[key]
+        return 202, {}, None
+    if request.command in ("GET", "HEAD") and blob is not None and blob["data"] is not None:
+        return 200, {"x-ms-blob-type": "BlockBlob", "Content-Type": "application/octet-stream"}, blob["data"]
+
+    if request.command == "PUT":
+        return 400, {}, _error("InvalidQueryParameterValue", "comp")
+    return 404, {"x-ms-error-code": "BlobNotFound"}, _error("BlobNotFound", "The specified blob does not exist.")
+
+
+def _read_copy_source(headers: Mapping[str, str]) -> Tuple[int, bytes]:
+    source = urllib.request.Request(headers["x-ms-copy-source"])
+    if headers.get("x-ms-source-range"):
+        source.add_header("Range", headers["x-ms-source-range"])
+    try:
+        with urllib.request.urlopen(source, timeout=30) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, b""
+    except OSError:
+        return 403, b""
+
+
+def _unknown(request: _EmulatorRequestHandler, params: Dict[str, str], query: Dict[str, str], body: Any) -> Response:
+    return 404, {}, _error("NotSupported", f"{request.command} {request.path} is not emulated")
+
+
+RouteHandler = Callable[[_EmulatorRequestHandler, Dict[str, str], Dict[str, str], Any], Response]
+
+# (route name, methods, path pattern, handler); the route name prefix is
+# the service the request is counted against in the stats.
+ROUTES: List[Tuple[str, Tuple[str, ...], str, RouteHandler]] = [
+    ("aad.token", ("POST",), TOKEN_PATH, _token),
+    ("arm.batch", ("POST",), BATCH_PATH, _batch),
+    ("arm.operation", ("GET",), OPERATION_PATH, _operation),
+    ("arm.name_availability", ("POST",), NAME_AVAILABILITY_PATH, _name_availability),
+    ("arm.storage_account", ("GET", "PUT", "PATCH", "DELETE"), STORAGE_ACCOUNT_PATH, _storage_account),
+    ("arm.account_keys", ("POST",), ACCOUNT_KEYS_PATH, _account_keys),
+    ("arm.storage_accounts", ("GET",), STORAGE_ACCOUNTS_PATH, _storage_accounts),
+    ("arm.resources", ("GET",), RESOURCES_PATH, _resources),
+    ("arm.resource_group", ("GET", "HEAD", "PUT", "DELETE"), RESOURCE_GROUP_PATH, _resource_group),
+    ("blob.service", ("POST",), BLOB_SERVICE_PATH, _blob_service),
+    ("blob.container", ("GET", "HEAD", "PUT", "DELETE"), CONTAINER_PATH, _container),
+    ("blob.blob", ("GET", "HEAD", "PUT", "DELETE"), BLOB_PATH, _blob),
+]
+
+
+def _match_route(method: str, path: str) -> Tuple[str, RouteHandler, Dict[str, str]]:
+    for name, methods, pattern, handler in ROUTES:
+        match = re.fullmatch(pattern, path, flags=re.IGNORECASE)
+        if match and method in methods:
+            return name, handler, match.groupdict()
+
+    return "unknown", _unknown, {}
+
+
+def _drop_account(state: _AzureState, key: Tuple[str, str, str]) -> None:
+    state.accounts.pop(key, None)
+    for container_key in [k for k in state.containers if k[0] == key[2]]:
+        del state.containers[container_key]
+    for blob_key in [k for k in state.blobs if k[0] == key[2]]:
+        del state.blobs[blob_key]
+
+
+def _account_key(account_name: str, key_name: str) -> str:
+    return base64.b64encode(hashlib.sha512(f"{account_name}/{key_name}".encode()).digest()).decode()
+
+
+def _parse_body(body: bytes) -> Any:
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return {k: v[-1] for k, v in parse_qs(body.decode(errors="replace")).items()}
+
+
+def _error(code: str, message: str) -> Dict[str, Any]:
+    return {"error": {"code": code, "message": message}}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--provisioning-seconds", type=float, default=5.0)
+    parser.add_argument("--retry-after-seconds", type=int, default=1)
+    parser.add_argument("--arm-request-quota", type=int, default=12000)
+    parser.add_argument("--list-page-size", type=int, default=100)
+    parser.add_argument("--client-secret", default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    config = EmulatorConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        throttle_rate=args.throttle_rate,
+        failure_rate=args.failure_rate,
+        provisioning_seconds=args.provisioning_seconds,
+        retry_after_seconds=args.retry_after_seconds,
+        arm_request_quota=args.arm_request_quota,
+        list_page_size=args.list_page_size,
+        client_secret=args.client_secret,
+        seed=args.seed,
+    )
+    emulator = AzureEmulator(config, host=args.host, port=args.port)
+    print(f"Azure emulator listening on {emulator.url} (export AZURE_EMULATOR_URL={emulator.url})")
+    try:
+        emulator.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""End-to-end latency and API call benchmark for the POC::Azure::BlobStorage handlers.
+
+Each lifecycle drives the handlers through resource.test_entrypoint, the same
+way CloudFormation does: CREATE and its callbacks, READ, LIST through every
+page, then DELETE and its callbacks.  Every other resource is a Premium
+BlockBlobStorage account, that has no access tier.  The handlers run against
+the local Azure emulator (started here, or an already running one with
+--emulator-url), so no Azure tenant is needed.
+
+    python tools/benchmark.py --lifecycles 20 --concurrency 5 --latency-ms 40 --output bench.json
+
+The results are written as JSON: per lifecycle wall time and billed time
+(the handler invocation time Lambda would bill, without callback delays),
+plus HTTP requests per service, token fetches and bytes transferred.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import statistics
+import sys
+import time
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Tuple,
+)
+from urllib.request import Request, urlopen
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT_DIR, "src"), os.path.join(ROOT_DIR, "tools")]
+
+from azure_emulator import AzureEmulator, EmulatorConfig  # noqa: E402
+
+# Credentials are required by the test entrypoint to build a boto3 session;
+# the handlers never use them to call AWS.
+TEST_CREDENTIALS = {
+    "accessKeyId": "AKIAEXAMPLE",
+    "secretAccessKey": "secret",
+    "sessionToken": "token",
+}
+
+# Premium accounts come back from ARM without an access tier.
+PREMIUM_BLOCK_BLOB = {
+    "AzureStorageSku": "Premium_LRS",
+    "AzureStorageKind": "BlockBlobStorage",
+}
+
+# Safety net against handlers that never leave IN_PROGRESS.
+MAX_INVOCATIONS_PER_ACTION = 500
+
+
+def run_action(
+    action: str,
+    model: Mapping[str, Any],
+    index: int,
+    callback_delay_scale: float,
+    previous_model: Optional[Mapping[str, Any]] = None,
+) -> Tuple[Dict[str, Any], List[float]]:
+    """Invoke a handler, and its callbacks, until it leaves IN_PROGRESS."""
+    from poc_azure_blobstorage.handlers import test_entrypoint
+
+    callback_context: MutableMapping[str, Any] = {}
+    durations: List[float] = []
+
+    for _ in range(MAX_INVOCATIONS_PER_ACTION):
+        event = {
+            "credentials": TEST_CREDENTIALS,
+            "action": action,
+            "region": "us-east-1",
+            "request": {
+                "clientRequestToken": f"benchmark-{index}-{action.lower()}",
+                "desiredResourceState": model,
+                "previousResourceState": previous_model,
+                "logicalResourceIdentifier": f"AzureBlobStorage{index}",
+                "stackId": f"arn:aws:cloudformation:us-east-1:123456789012:stack/benchmark/{index}",
+                "region": "us-east-1",
+            },
+            "callbackContext": callback_context,
+        }
+
+        started = time.perf_counter()
+        progress = test_entrypoint(event, None)
+        durations.append(time.perf_counter() - started)
+
+        if progress["status"] != "IN_PROGRESS":
+            return progress, durations
+
+        callback_context = progress.get("callbackContext") or {}
+        model = progress.get("resourceModel") or model
+        time.sleep(progress.get("callbackDelaySeconds", 0) * callback_delay_scale)
+
+    raise RuntimeError(f"{action} still IN_PROGRESS after {MAX_INVOCATIONS_PER_ACTION} invocations")
+
+
+def run_list(model: Mapping[str, Any], index: int) -> Tuple[Dict[str, Any], List[float], List[Dict[str, Any]]]:
+    """Invoke the LIST handler for every page, following nextToken."""
+    from poc_azure_blobstorage.handlers import test_entrypoint
+
+    durations: List[float] = []
+    models: List[Dict[str, Any]] = []
+    next_token = None
+
+    for _ in range(MAX_INVOCATIONS_PER_ACTION):
+        event = {
+            "credentials": TEST_CREDENTIALS,
+            "action": "LIST",
+            "region": "us-east-1",
+            "request": {
+                "clientRequestToken": f"benchmark-{index}-list",
+                "desiredResourceState": model,
+                "logicalResourceIdentifier": f"AzureBlobStorage{index}",
+                "stackId": f"arn:aws:cloudformation:us-east-1:123456789012:stack/benchmark/{index}",
+                "region": "us-east-1",
+                "nextToken": next_token,
+            },
+            "callbackContext": {},
+        }
+
+        started = time.perf_counter()
+        progress = test_entrypoint(event, None)
+        durations.append(time.perf_counter() - started)
+
+        if progress["status"] != "SUCCESS":
+            return progress, durations, models
+
+        models.extend(progress.get("resourceModels") or [])
+        next_token = progress.get("nextToken")
+        if not next_token:
+            return progress, durations, models
+
+    raise RuntimeError(f"LIST still returning pages after {MAX_INVOCATIONS_PER_ACTION} invocations")
+
+
+def run_lifecycle(
+    index: int,
+    model: Mapping[str, Any],
+    callback_delay_scale: float,
+) -> Dict[str, Any]:
+    """Run CREATE -> READ -> LIST -> DELETE for one resource."""
+    result: Dict[str, Any] = {
+        "index": index,
+        "ok": False,
+        "invocations": {},
+        "billed_ms": 0,
+    }
+    started = time.perf_counter()
+
+    try:
+        for action in ("CREATE", "READ", "LIST", "DELETE"):
+            if action == "LIST":
+                progress, durations, listed = run_list(model, index)
+            else:
+                progress, durations = run_action(action, model, index, callback_delay_scale)
+
+            result["invocations"][action] = len(durations)
+            # Lambda bills every invocation rounded up to the millisecond.
+            result["billed_ms"] += sum(math.ceil(d * 1000) for d in durations)
+
+            if progress["status"] != "SUCCESS":
+                result["error"] = f"{action}: {progress.get('errorCode')} {progress.get('message')}"
+                break
+            if action == "CREATE":
+                model = progress["resourceModel"]
+            if action == "LIST" and model["AzureBlobContainerUrl"] not in [m.get("AzureBlobContainerUrl") for m in listed]:
+                result["error"] = f"LIST: {model['AzureBlobContainerUrl']} missing from {len(listed)} listed models"
+                break
+        else:
+            result["ok"] = True
+    except Exception:
+        result["error"] = traceback.format_exc()
+
+    result["wall_seconds"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+
+    ordered = sorted(values)
+    return {
+        "min": ordered[0],
+        "mean": round(statistics.fmean(ordered), 4),
+        "p50": _percentile(ordered, 50),
+        "p90": _percentile(ordered, 90),
+        "p99": _percentile(ordered, 99),
+        "max": ordered[-1],
+    }
+
+
+def _percentile(ordered: List[float], percent: float) -> float:
+    rank = max(0, math.ceil(percent / 100.0 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def _emulator_stats(url: str) -> Dict[str, int]:
+    with urlopen(f"{url}/_emulator/stats", timeout=10) as response:
+        return json.loads(response.read())
+
+
+def _reset_emulator(url: str) -> None:
+    urlopen(Request(f"{url}/_emulator/reset", method="POST"), timeout=10).close()
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    emulator = None
+    if args.emulator_url:
+        emulator_url = args.emulator_url.rstrip("/")
+    else:
+        emulator = AzureEmulator(EmulatorConfig(
+            latency_ms=args.latency_ms,
+            latency_jitter_ms=args.latency_jitter_ms,
+            throttle_rate=args.throttle_rate,
+            failure_rate=args.failure_rate,
+            provisioning_seconds=args.provisioning_seconds,
+            retry_after_seconds=args.retry_after_seconds,
+            list_page_size=args.list_page_size,
+            seed=args.seed,
+        )).start()
+        emulator_url = emulator.url
+
+    os.environ["AZURE_EMULATOR_URL"] = emulator_url
+    # EMF records would be mixed into the JSON results on stdout.
+    os.environ.setdefault("METRICS_SINK", "none")
+    # Small LIST pages, so the handler follows ARM nextLinks and hands out nextTokens.
+    os.environ.setdefault("LIST_PAGE_SIZE", str(args.list_page_size))
+    _reset_emulator(emulator_url)
+
+    model = {
+        "AzureSubscriptionId": "00000000-0000-0000-0000-000000000000",
+        "AzureClientId": "benchmark-client",
+        "AzureTenantId": "benchmark-tenant",
+        "AzureClientSecret": "benchmark-secret",
+    }
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            lifecycles = list(executor.map(
+                lambda i: run_lifecycle(i, model if i % 2 == 0 else {**model, **PREMIUM_BLOCK_BLOB}, args.callback_delay_scale),
+                range(args.lifecycles),
+            ))
+        stats = _emulator_stats(emulator_url)
+    finally:
+        if emulator:
+            emulator.stop()
+    elapsed = time.perf_counter() - started
+
+    completed = [lc for lc in lifecycles if lc["ok"]]
+    count = max(len(lifecycles), 1)
+    http_requests = {
+        key.split(".", 1)[1]: value
+        for key, value in stats.items() if key.startswith("requests.")
+    }
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "summary": {
+            "lifecycles": len(lifecycles),
+            "succeeded": len(completed),
+            "failed": len(lifecycles) - len(completed),
+            "elapsed_seconds": round(elapsed, 4),
+            "wall_seconds": summarize([lc["wall_seconds"] for lc in completed]),
+            "billed_ms": summarize([lc["billed_ms"] for lc in completed]),
+            "http_requests": http_requests,
+            "http_requests_per_lifecycle": {k: round(v / count, 2) for k, v in http_requests.items()},
+            "http_routes": {
+                key.split(".", 1)[1]: value
+                for key, value in stats.items() if key.startswith("route.")
+            },
+            "token_fetches": stats.get("tokens_issued", 0),
+            "throttled_responses": stats.get("throttled", 0),
+            "failed_responses": stats.get("failed", 0),
+            "bytes_sent": stats.get("bytes_in", 0),
+            "bytes_received": stats.get("bytes_out", 0),
+        },
+        "lifecycles": lifecycles,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lifecycles", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--emulator-url", default=None, help="use an already running emulator")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--provisioning-seconds", type=float, default=2.0)
+    parser.add_argument("--retry-after-seconds", type=int, default=1)
+    parser.add_argument("--callback-delay-scale", type=float, default=1.0,
+                        help="fraction of callbackDelaySeconds actually waited between callbacks")
+    parser.add_argument("--list-page-size", type=int, default=3,
+                        help="storage accounts per ARM page and per LIST page")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    # The handlers log every step at INFO level (LOG_LEVEL); keep the
+    # output to errors only.
+    logging.basicConfig(level=logging.ERROR)
+    logging.disable(logging.WARNING)
+
+    results = run_benchmark(args)
+
+    output = json.dumps(results, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(json.dumps(results["summary"], indent=2))
+    else:
+        print(output)
+
+    return 0 if results["summary"]["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Cold start import time check for the POC::Azure::BlobStorage handlers.
+
+Imports the handler module in fresh interpreters with -X importtime, and
+fails when the modules it loads on top of cloudformation_cli_python_lib
+(that every resource type pays for) take longer than a budget to import,
+or when one of the heavy dependencies the handlers deliberately avoid is
+imported at module load.
+
+    python tools/check_import_time.py --budget-ms 40 --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+
+HANDLERS_MODULE = "poc_azure_blobstorage.handlers"
+BASELINE_MODULE = "cloudformation_cli_python_lib"
+
+# Modules that must only be imported when they are used, if at all.
+FORBIDDEN_MODULES = (
+    "adal",
+    "cryptography",
+    "jwt",
+)
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure(module: str) -> Tuple[Dict[str, int], List[str]]:
+    """Import module in a fresh interpreter; return the self import time of
+    every module loaded, in microseconds, and the modules in sys.modules."""
+    code = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=SRC_DIR,
+        env={**os.environ, "PYTHONPATH": SRC_DIR},
+        check=True,
+    )
+
+    self_times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_times[match.group(4)] = int(match.group(1))
+
+    return self_times, json.loads(result.stdout)
+
+
+def overhead_ms(baseline_modules: Set[str], self_times: Dict[str, int]) -> float:
+    """Import time of the modules the baseline does not load.
+
+    Summing self times of those modules, rather than diffing two total
+    import times, keeps the noise of the shared imports out of the result.
+    """
+    return sum(us for name, us in self_times.items() if name not in baseline_modules) / 1000.0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("IMPORT_TIME_BUDGET_MS", "40")),
+                        help="import time allowed on top of cloudformation_cli_python_lib")
+    parser.add_argument("--runs", type=int, default=5, help="the fastest run is kept, to filter out noise")
+    args = parser.parse_args(argv)
+
+    # Warm the bytecode and file system caches, as in a warm Lambda image.
+    measure(HANDLERS_MODULE)
+
+    baseline_modules: Set[str] = set()
+    for _ in range(args.runs):
+        baseline_modules.update(measure(BASELINE_MODULE)[0])
+
+    runs = [measure(HANDLERS_MODULE) for _ in range(args.runs)]
+    overhead = min(overhead_ms(baseline_modules, self_times) for self_times, _ in runs)
+    modules = runs[0][1]
+    added = sorted(set(runs[0][0]) - baseline_modules)
+
+    forbidden = [m for m in FORBIDDEN_MODULES if m in modules]
+
+    report: Dict[str, object] = {
+        "overhead_ms": round(overhead, 1),
+        "budget_ms": args.budget_ms,
+        "modules_added": added,
+        "forbidden_modules_imported": forbidden,
+    }
+    print(json.dumps(report, indent=2))
+
+    if forbidden:
+        print(f"FAIL: {', '.join(forbidden)} imported when loading {HANDLERS_MODULE}", file=sys.stderr)
+        return 1
+    if overhead > args.budget_ms:
+        print(f"FAIL: {HANDLERS_MODULE} adds {overhead:.1f}ms of imports, over the {args.budget_ms}ms budget", file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())